@@ -0,0 +1,145 @@
+"""Streaming estimators of the distances reached by walks."""
+
+from math import sqrt
+
+# Quantile of the normal distribution giving 95% confidence intervals
+DEF_Z_VALUE = 1.96
+# Minimum number of walks before the precision of an estimate is trusted
+DEF_MIN_WALKS = 30
+
+class Accumulator(object):
+    """Weighted mean and variance of the distance R and of R^2, updated walk by walk (Welford)."""
+
+    # Constructor
+    def __init__(self):
+        # Number of walks, sum of their weights and of their squared weights
+        self.count = 0
+        self.weight = 0.0
+        self.weight2 = 0.0
+        # Mean and sum of squared deviations of R, then of R^2
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.meanSq = 0.0
+        self.m2Sq = 0.0
+        # Blocks of correlated walks (none for independent walks) : number of blocks, sums of their
+        # weights and squared weights, mean and sum of squared deviations of their mean R
+        self.blocks = 0
+        self.blockWeight = 0.0
+        self.blockWeight2 = 0.0
+        self.blockMean = 0.0
+        self.blockM2 = 0.0
+
+    def add(self, value, weight=1.0):
+        """Adds the distance reached by a walk."""
+        self.count += 1
+        # Trapped walks have a null weight
+        if weight <= 0:
+            return
+        self.weight += weight
+        self.weight2 += weight * weight
+        ratio = weight / self.weight
+        delta = value - self.mean
+        self.mean += delta * ratio
+        self.m2 += weight * delta * (value - self.mean)
+        square = value * value
+        deltaSq = square - self.meanSq
+        self.meanSq += deltaSq * ratio
+        self.m2Sq += weight * deltaSq * (square - self.meanSq)
+
+    def addBatch(self, values):
+        """Adds the distances reached by several walks, given as a NumPy array (unit weights)."""
+        if len(values) == 0:
+            return
+        batch = Accumulator()
+        batch.count = len(values)
+        batch.weight = batch.weight2 = float(len(values))
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean)**2).sum())
+        squares = values * values
+        batch.meanSq = float(squares.mean())
+        batch.m2Sq = float(((squares - batch.meanSq)**2).sum())
+        self.merge(batch)
+
+    def addBlock(self, block):
+        """Adds the walks of an accumulator as a block of correlated walks (batch means)."""
+        self.merge(block)
+        self.blocks += 1
+        if block.weight == 0:
+            return
+        # The mean R of the block counts as one independent value, weighted by the block weight
+        self.blockWeight += block.weight
+        self.blockWeight2 += block.weight * block.weight
+        delta = block.mean - self.blockMean
+        self.blockMean += delta * block.weight / self.blockWeight
+        self.blockM2 += block.weight * delta * (block.mean - self.blockMean)
+
+    def merge(self, other):
+        """Merges the walks of another accumulator (Chan's parallel formula)."""
+        self.count += other.count
+        self.blocks += other.blocks
+        if other.blockWeight > 0:
+            total = self.blockWeight + other.blockWeight
+            delta = other.blockMean - self.blockMean
+            self.blockM2 += other.blockM2\
+            + delta * delta * self.blockWeight * other.blockWeight / total
+            self.blockMean += delta * other.blockWeight / total
+            self.blockWeight = total
+            self.blockWeight2 += other.blockWeight2
+        if other.weight == 0:
+            return
+        total = self.weight + other.weight
+        delta = other.mean - self.mean
+        deltaSq = other.meanSq - self.meanSq
+        self.m2 += other.m2 + delta * delta * self.weight * other.weight / total
+        self.m2Sq += other.m2Sq + deltaSq * deltaSq * self.weight * other.weight / total
+        self.mean += delta * other.weight / total
+        self.meanSq += deltaSq * other.weight / total
+        self.weight = total
+        self.weight2 += other.weight2
+
+    def getState(self):
+        """Returns the state of the accumulator, as a dictionary."""
+        return dict(self.__dict__)
+
+    def setState(self, state):
+        """Restores a state returned by getState."""
+        self.__dict__.update(state)
+
+    def variance(self):
+        """Returns the variance of R."""
+        return self.m2 / self.weight if self.weight > 0 else 0.0
+
+    def varianceSq(self):
+        """Returns the variance of R^2."""
+        return self.m2Sq / self.weight if self.weight > 0 else 0.0
+
+    def halfWidth(self, z=DEF_Z_VALUE):
+        """Returns the half width of the confidence interval of the mean of R."""
+        if self.weight == 0:
+            return float('inf')
+        if self.blocks > 0:
+            return self.blockHalfWidth(z)
+        # Weighted walks count as weight^2 / weight2 independent walks
+        return z * sqrt(self.variance() * self.weight2) / self.weight
+
+    def blockHalfWidth(self, z=DEF_Z_VALUE):
+        """Returns the half width of the confidence interval of the mean of R, from its blocks."""
+        # Blocks count as blockWeight^2 / blockWeight2 independent values (unbiased variance)
+        nbValues = self.blockWeight * self.blockWeight / self.blockWeight2\
+        if self.blockWeight > 0 else 0
+        if nbValues <= 1:
+            return float('inf')
+        variance = self.blockM2 / self.blockWeight * nbValues / (nbValues - 1)
+        return z * sqrt(variance * self.blockWeight2) / self.blockWeight
+
+    def ordinate(self):
+        """Returns the squared mean distance, the value plotted against the number of steps."""
+        return pow(self.mean, 2)
+
+    def ordinateHalfWidth(self, z=DEF_Z_VALUE):
+        """Returns the half width of the confidence interval of the ordinate."""
+        return 2 * self.mean * self.halfWidth(z)
+
+    def precise(self, tolerance, minWalks=DEF_MIN_WALKS):
+        """Checks if the relative half width of the confidence interval of R is under tolerance."""
+        return self.count >= minWalks and self.halfWidth() <= tolerance * self.mean
@@ -0,0 +1,280 @@
+"""Command line runner of walks and sweeps, without display, streaming its results."""
+
+import os
+import sys
+import csv
+import random
+import zipfile
+import argparse
+import contextlib
+
+import WalkStats
+from Walk import WalkType, distance
+from OneTermGenerator import OneTermGenerator
+from TwoTermGenerator import TwoTermGenerator
+from BufferedGenerator import BufferedGenerator
+from DirectionSource import DirectionSource
+
+# Default number of walks asked at once to a sampler (pivot, Rosenbluth, PERM)
+DEF_SAMPLER_CHUNK = 1000
+# Default number of rows of a NPZ chunk
+DEF_NPZ_CHUNK = 65536
+
+# Columns of the output of each command
+WALK_COLUMNS = ('walk', 'x', 'y', 'distance', 'weight')
+CELL_COLUMNS = ('walkType', 'steps', 'walks', 'weight', 'mean', 'halfWidth', 'ordinate',\
+'ordinateHalfWidth', 'meanSquare')
+
+GENERATORS = {'native': None, 'one': OneTermGenerator, 'two': TwoTermGenerator}
+
+# ============================================= OUTPUTS ============================================
+class CsvWriter(object):
+    """Writes rows in a CSV file (or the standard output), as soon as they are given."""
+
+    # Constructor
+    def __init__(self, path, columns):
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, row):
+        """Writes a row."""
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        """Closes the file."""
+        if self.file is not sys.stdout:
+            self.file.close()
+
+class NpzWriter(object):
+    """Writes rows in a NPZ archive, by chunks of at most chunkSize rows ('rows_00000', ...)."""
+
+    # Constructor
+    def __init__(self, path, columns, chunkSize=DEF_NPZ_CHUNK):
+        # Imported here, NumPy being only needed by this output
+        import numpy
+        self.numpy = numpy
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self.chunkSize = chunkSize
+        self.rows = []
+        self.nbChunks = 0
+        self.save('columns', numpy.array(columns))
+
+    def save(self, name, array):
+        """Adds an array to the archive."""
+        with self.archive.open(name + '.npy', 'w', force_zip64=True) as member:
+            self.numpy.lib.format.write_array(member, array)
+
+    def write(self, row):
+        """Writes a row, the chunk being saved once full."""
+        self.rows.append(row)
+        if len(self.rows) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """Saves the pending rows as a chunk."""
+        if self.rows:
+            self.save("rows_{:05d}".format(self.nbChunks), self.numpy.array(self.rows, dtype=float))
+            self.nbChunks += 1
+            self.rows = []
+
+    def close(self):
+        """Saves the pending rows, then closes the archive."""
+        self.flush()
+        self.archive.close()
+
+def openWriter(path, columns):
+    """Opens a writer, according to the extension of the path ('-' for the standard output)."""
+    if path.endswith('.npz'):
+        return NpzWriter(path, columns)
+    return CsvWriter(path, columns)
+
+def readNpz(path):
+    """Reads a NPZ archive written by NpzWriter, returns its columns and all its rows."""
+    import numpy
+    with numpy.load(path) as archive:
+        chunks = sorted(name for name in archive.files if name.startswith('rows_'))
+        rows = numpy.concatenate([archive[name] for name in chunks]) if chunks else\
+        numpy.empty((0, len(archive['columns'])))
+        return list(archive['columns']), rows
+
+# ============================================== RUNS ==============================================
+def walkRows(walkType, nbSteps, nbWalks, backtrack=False, generator=None,\
+chunkSize=DEF_SAMPLER_CHUNK):
+    """Generates walks one after the other, yields a (walk, x, y, distance, weight) row for each."""
+    # Imported here, Results needing NumPy
+    from Results import WALKS, SAMPLERS
+    startPoint = (0, 0)
+    index = 0
+    number = 0
+    while index < nbWalks:
+        if walkType in SAMPLERS:
+            # PERM gives the walks of a tour, the number of walks being then a number of tours
+            chunk = min(chunkSize, nbWalks - index)
+            samples = SAMPLERS[walkType](startPoint, nbSteps, chunk, generator)
+            index += chunk
+        else:
+            arrival = None
+            while arrival is None:
+                if walkType == WalkType.SELF_AVOIDING:
+                    arrival = WALKS[walkType](startPoint, nbSteps, backtrack, generator=generator)
+                else:
+                    arrival = WALKS[walkType](startPoint, nbSteps, generator=generator)
+            samples = [(arrival, 1.0)]
+            index += 1
+        for arrival, weight in samples:
+            if weight > 0:
+                yield (number, arrival[0], arrival[1], distance(startPoint, arrival), weight)
+            else:
+                # Trapped walks have a null weight, and no arrival
+                yield (number, 0, 0, 0.0, 0.0)
+            number += 1
+
+def cellRows(cells):
+    """Yields a row for each (walk type, ab, accumulator) cell of a sweep."""
+    for walkType, ab, acc in cells:
+        yield (walkType.value, ab, acc.count, acc.weight, acc.mean, acc.halfWidth(),\
+        acc.ordinate(), acc.ordinateHalfWidth(), acc.meanSq)
+
+def sweepRows(maxStep, nbWalks, batch, sawType, nbWorkers, prefix, tolerance, cacheDir, seed=0):
+    """Runs a sweep, yields the row of each cell (as soon as it is computed, without workers)."""
+    from Results import buildAbs, sweepCells, parallelBuildAcc
+    from ResultCache import ResultCache
+    abscissaTab = buildAbs(maxStep)
+    cache = None if cacheDir is None else ResultCache(cacheDir)
+    if nbWorkers is None:
+        yield from cellRows(sweepCells(abscissaTab, nbWalks, batch, sawType, prefix, tolerance,\
+        cache, seed))
+    else:
+        walkTypes = (WalkType.RANDOM, WalkType.NON_REVERSING, sawType)
+        accs = parallelBuildAcc(abscissaTab, nbWalks, nbWorkers, batch, sawType, prefix, tolerance,\
+        seed=seed, cache=cache)
+        yield from cellRows((walkType, ab, acc) for walkType, walkAccs in zip(walkTypes, accs)\
+        for ab, acc in zip(abscissaTab, walkAccs))
+
+# ========================================== COMMAND LINE ==========================================
+def parseArguments(argv=None):
+    """Parses the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    walkTypes = [walkType.name for walkType in WalkType]
+    sawTypes = ['SELF_AVOIDING', 'PIVOT', 'ROSENBLUTH', 'PERM']
+    # Common options
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--seed', type=int,\
+    help="seed of the native generator (and of the cells of a sweep, 0 by default)")
+    common.add_argument('--stats', action='store_true',\
+    help="print the walk statistics on the standard error")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('-o', '--output', default='-',\
+    help="CSV file, NPZ file (.npz extension), or '-' for the standard output (default)")
+    # Options of independent walks
+    walks = argparse.ArgumentParser(add_help=False)
+    walks.add_argument('type', choices=walkTypes)
+    walks.add_argument('steps', type=int)
+    walks.add_argument('-n', '--walks', type=int, default=1, help="number of walks (PERM : tours)")
+    walks.add_argument('--backtrack', action='store_true',\
+    help="backtrack instead of cancelling self-avoiding walks")
+    walks.add_argument('--generator', choices=list(GENERATORS), default='native')
+    walks.add_argument('--buffered', action='store_true', help="generate the numbers by blocks")
+    walks.add_argument('--sliced', action='store_true',\
+    help="slice each random number in many directions (instead of --buffered)")
+    commands.add_parser('walk', parents=[common, output, walks], help="run independent walks")
+    store = commands.add_parser('store', parents=[common, walks],\
+    help="add independent walks to an ensemble store (created if needed)")
+    store.add_argument('directory')
+    store.add_argument('--with-steps', action='store_true',\
+    help="keep the steps of the walks, not only their end points (at the store creation)")
+    sweep = commands.add_parser('sweep', parents=[common, output], help="run the sweep of Results")
+    sweep.add_argument('maxStep', type=int)
+    sweep.add_argument('-n', '--walks', type=int, default=500, help="walks per cell")
+    sweep.add_argument('--saw-type', choices=sawTypes, default='SELF_AVOIDING')
+    sweep.add_argument('--batch', action='store_true', help="simulate with NumPy")
+    sweep.add_argument('--prefix', action='store_true', help="use the prefixes of walks (NumPy)")
+    sweep.add_argument('--workers', type=int, help="number of worker processes")
+    sweep.add_argument('--tolerance', type=float, help="relative precision stopping a cell"\
+    " (not the PIVOT and PERM ones, whose walks are correlated)")
+    sweep.add_argument('--cache', help="directory of the result cache")
+    args = parser.parse_args(argv)
+    # A congruential generator seeded out of [1, modulo - 1] is stuck (at 0 forever)
+    if getattr(args, 'generator', 'native') != 'native' and args.seed is not None and\
+    not seedGenerator(GENERATORS[args.generator](), args.seed):
+        parser.error("--seed must be between 1 and the modulo - 1 with the '{}' generator"\
+        .format(args.generator))
+    if args.command == 'store' and args.with_steps:
+        from EnsembleStore import STEP_TYPES
+        if WalkType[args.type] not in STEP_TYPES:
+            parser.error("the steps of {} walks can not be kept (--with-steps)".format(args.type))
+    return args
+
+def seedGenerator(generator, seed):
+    """Seeds a congruential generator, returns False if the seed is out of its range."""
+    if isinstance(generator, TwoTermGenerator):
+        return generator.changeSeedn_2(seed) and generator.changeSeedn_1(seed)
+    return generator.changeSeed(seed)
+
+def buildGenerator(args):
+    """Creates the generator given by the walk options."""
+    generator = GENERATORS[args.generator]
+    if generator is not None:
+        generator = generator()
+        if args.seed is not None:
+            seedGenerator(generator, args.seed)
+    if args.sliced:
+        generator = DirectionSource(generator)
+    elif args.buffered and generator is not None:
+        generator = BufferedGenerator(generator)
+    return generator
+
+def storeWalks(args):
+    """Adds the walks given by the walk options to an ensemble store."""
+    # Imported here, the store needing NumPy
+    import EnsembleStore
+    generator = buildGenerator(args)
+    walkType = WalkType[args.type]
+    if os.path.exists(os.path.join(args.directory, EnsembleStore.META_FILE)):
+        store = EnsembleStore.EnsembleStore(args.directory, writable=True)
+        try:
+            store.addBatch(walkType, args.steps, generator, args.seed, backtrack=args.backtrack)
+        except ValueError as error:
+            raise SystemExit("can not append to {} : {}".format(args.directory, error))
+    else:
+        store = EnsembleStore.create(args.directory, walkType, args.steps, args.with_steps,\
+        generator, args.seed, backtrack=args.backtrack)
+    with store:
+        EnsembleStore.recordWalks(store, args.steps, args.walks, args.backtrack, generator)
+    print(len(store), "walks in", args.directory, file=sys.stderr)
+
+def main(argv=None):
+    """Runs the command line."""
+    args = parseArguments(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.stats:
+        WalkStats.enable()
+    if args.command == 'store':
+        storeWalks(args)
+    elif args.command == 'walk':
+        rows = walkRows(WalkType[args.type], args.steps, args.walks, args.backtrack,\
+        buildGenerator(args))
+        columns = WALK_COLUMNS
+    else:
+        rows = sweepRows(args.maxStep, args.walks, args.batch, WalkType[args.saw_type],\
+        args.workers, args.prefix, args.tolerance, args.cache, args.seed or 0)
+        columns = CELL_COLUMNS
+    if args.command != 'store':
+        writer = openWriter(args.output, columns)
+        try:
+            # The progress messages go to the standard error, the results being on the standard
+            # output
+            with contextlib.redirect_stdout(sys.stderr):
+                for row in rows:
+                    writer.write(row)
+        finally:
+            writer.close()
+    if args.stats:
+        print(WalkStats.ACTIVE.report(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Batched walks, simulated all at once as NumPy arrays."""
+
+import numpy as np
+
+from Walk import WalkType
+
+# Step vector of each direction code (NORTH, EAST, SOUTH, WEST)
+STEPS = np.array([[0, 1], [1, 0], [0, -1], [-1, 0]], dtype=np.int64)
+
+# ============================================= DRAWS ==============================================
+def randomDirections(nbWalks, nbSteps, rng):
+    """Draws the direction codes of random walks."""
+    return rng.integers(0, 4, size=(nbWalks, nbSteps), dtype=np.int8)
+
+def nonReversingDirections(nbWalks, nbSteps, rng):
+    """Draws the direction codes of non reversing walks."""
+    if nbSteps == 0:
+        return np.empty((nbWalks, 0), dtype=np.int8)
+    # The first step is free, then each step turns left (-1), goes straight (0) or turns right (+1),
+    # which never gives the opposite of the previous direction
+    first = rng.integers(0, 4, size=(nbWalks, 1), dtype=np.int64)
+    turns = rng.integers(-1, 2, size=(nbWalks, nbSteps - 1), dtype=np.int64)
+    return (np.cumsum(np.concatenate((first, turns), axis=1), axis=1) % 4).astype(np.int8)
+
+DRAWS = {WalkType.RANDOM: randomDirections, WalkType.NON_REVERSING: nonReversingDirections}
+
+# ============================================== WALKS =============================================
+def batchWalk(walkType, startPoint, nbSteps, nbWalks, paths=False, rng=None):
+    """Simulates nbWalks walks of nbSteps steps, returns their arrival points (and paths)."""
+    if rng is None:
+        rng = np.random.default_rng()
+    codes = DRAWS[walkType](nbWalks, nbSteps, rng)
+    start = np.asarray(startPoint, dtype=np.int64)
+    if paths:
+        # Visited points of each walk, starting point included
+        points = np.empty((nbWalks, nbSteps + 1, 2), dtype=np.int64)
+        points[:, 0] = start
+        np.cumsum(STEPS[codes], axis=1, out=points[:, 1:])
+        points[:, 1:] += start
+        return points[:, -1].copy(), points
+    # The arrival point only depends on the number of steps in each direction
+    counts = np.stack([np.count_nonzero(codes == code, axis=1) for code in range(4)], axis=1)
+    return start + counts @ STEPS
+
+def batchCheckpoints(walkType, startPoint, checkpoints, nbWalks, rng=None):
+    """Simulates nbWalks walks once, returns their points at each checkpoint (number of steps)."""
+    if rng is None:
+        rng = np.random.default_rng()
+    codes = DRAWS[walkType](nbWalks, max(checkpoints, default=0), rng)
+    points = np.empty((nbWalks, len(checkpoints), 2), dtype=np.int64)
+    position = np.tile(np.asarray(startPoint, dtype=np.int64), (nbWalks, 1))
+    done = 0
+    # Every shorter walk is a prefix of the longest one : only the steps between two consecutive
+    # checkpoints are added to the position
+    for index in sorted(range(len(checkpoints)), key=lambda i: checkpoints[i]):
+        part = codes[:, done:checkpoints[index]]
+        counts = np.stack([np.count_nonzero(part == code, axis=1) for code in range(4)], axis=1)
+        position += counts @ STEPS
+        points[:, index] = position
+        done = checkpoints[index]
+    return points
+
+def batchRandomWalk(startPoint, nbSteps, nbWalks, paths=False, rng=None):
+    """Generates nbWalks random walks at once."""
+    return batchWalk(WalkType.RANDOM, startPoint, nbSteps, nbWalks, paths, rng)
+
+def batchNonReversingWalk(startPoint, nbSteps, nbWalks, paths=False, rng=None):
+    """Generates nbWalks non reversing walks at once."""
+    return batchWalk(WalkType.NON_REVERSING, startPoint, nbSteps, nbWalks, paths, rng)
+
+def batchDistances(startPoint, arrivals):
+    """Computes the Euclidian distances between the starting point and the arrival points."""
+    return np.hypot(*(arrivals - np.asarray(startPoint)).T)
+# ==================================================================================================
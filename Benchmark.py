@@ -0,0 +1,147 @@
+"""Throughput of the walks, generators and GUI transport, compared to a baseline."""
+
+import sys
+import json
+import platform
+from random import seed
+from time import perf_counter, sleep
+from multiprocessing import Queue
+
+from Walk import WalkType, randomWalk, nonReversingWalk, selfAvoidingWalk
+from OneTermGenerator import OneTermGenerator
+from TwoTermGenerator import TwoTermGenerator
+from DirectionSource import DirectionSource
+from Transport import ChunkedReceiver
+from RWLauncher import RWLauncher
+
+# Default number of runs of a measure, the best one being kept
+DEF_REPEATS = 3
+# Default relative slowdown from the baseline reported as a regression
+DEF_TOLERANCE = 0.2
+
+def bestRate(func, amount, repeats=DEF_REPEATS):
+    """Returns the best rate (amount per second) of several runs of a function."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return amount / best if best > 0 else float('inf')
+
+# ============================================= MEASURES ===========================================
+def benchWalks(lengths, rejectionLengths, nbSteps, repeats=DEF_REPEATS):
+    """Measures the steps per second of the walks, for each length."""
+    rates = {}
+    walks = [('randomWalk', randomWalk, lengths), ('nonReversingWalk', nonReversingWalk, lengths),\
+    ('selfAvoidingWalk/backtrack', lambda p, n: selfAvoidingWalk(p, n, True), lengths),\
+    ('selfAvoidingWalk', selfAvoidingWalk, rejectionLengths)]
+    for name, func, walkLengths in walks:
+        for length in walkLengths:
+            nbWalks = max(1, nbSteps // length)
+            rates["{}/{}".format(name, length)] = bestRate(lambda: completeWalks(func, length,\
+            nbWalks), nbWalks * length, repeats)
+    return rates
+
+def completeWalks(func, length, nbWalks):
+    """Generates nbWalks walks, retrying the cancelled ones."""
+    # Same walks at each run, the number of cancelled ones being random
+    seed(length)
+    for _ in range(nbWalks):
+        while func((0, 0), length) is None:
+            pass
+
+def benchGenerators(nbValues, repeats=DEF_REPEATS):
+    """Measures the values per second of the generators, one by one, by blocks and sliced."""
+    rates = {}
+    for name, generatorClass in (('OneTermGenerator', OneTermGenerator),\
+    ('TwoTermGenerator', TwoTermGenerator)):
+        generator = generatorClass()
+        rates[name + ".generate"] = bestRate(lambda: [generator.generate()\
+        for _ in range(nbValues)], nbValues, repeats)
+        rates[name + ".generateBlock"] = bestRate(lambda: generator.generateBlock(nbValues),\
+        nbValues, repeats)
+    # Choices among the 3 directions allowed after a step, sliced from the numbers
+    for name, generator in (('native', None), ('OneTermGenerator', OneTermGenerator()),\
+    ('TwoTermGenerator', TwoTermGenerator())):
+        source = DirectionSource(generator)
+        rates["DirectionSource({}).pick".format(name)] = bestRate(lambda: [source.pick(3)\
+        for _ in range(nbValues)], nbValues, repeats)
+    return rates
+
+def benchTransport(nbMessages, repeats=DEF_REPEATS):
+    """Measures the moves per second sent by a RWLauncher process and received as by the GUI."""
+    return {"RWLauncher->GUI": bestRate(lambda: transportWalk(nbMessages), nbMessages, repeats)}
+
+def transportWalk(nbSteps):
+    """Runs a random walk in a RWLauncher process, and consumes its moves."""
+    guiQueue = Queue()
+    proc = RWLauncher((0, 0), nbSteps, WalkType.RANDOM, False, guiQueue)
+    receiver = ChunkedReceiver(guiQueue)
+    proc.start()
+    while not receiver.done():
+        if receiver.drain() == 0:
+            sleep(0.001)
+        receiver.commands()
+    proc.join()
+
+# ============================================= BASELINE ===========================================
+def writeResults(path, rates):
+    """Writes the rates in a JSON file, with the machine they were measured on."""
+    with open(path, 'w') as output:
+        json.dump({'python': platform.python_version(), 'machine': platform.platform(),\
+        'rates': rates}, output, indent=2, sort_keys=True)
+
+def readRates(path):
+    """Reads the rates of a JSON file written by writeResults."""
+    with open(path) as source:
+        return json.load(source)['rates']
+
+def compareRates(rates, baseline, tolerance=DEF_TOLERANCE):
+    """Prints the rates against the baseline, returns the names of the regressions."""
+    regressions = []
+    for name in sorted(rates):
+        if name not in baseline:
+            print(" -> {:<40} {:>14.0f} /s (no baseline)".format(name, rates[name]))
+            continue
+        ratio = rates[name] / baseline[name]
+        slower = ratio < 1 - tolerance
+        if slower:
+            regressions.append(name)
+        print(" -> {:<40} {:>14.0f} /s  x{:.2f}{}".format(name, rates[name], ratio,\
+        "  REGRESSION" if slower else ""))
+    return regressions
+
+# ********************************** MODIFY ONLY THESE PARAMETERS **********************************
+# The numbers of steps of the measured walks, and of the self-avoiding walks without backtrack
+# (cancelled at the first collision, so kept short)
+LENGTHS = [10, 100, 1000]
+REJECTIONLENGTHS = [10, 20, 40]
+# The number of steps generated by a walk measure
+NBSTEPS = 20000
+# The number of values generated by a generator measure
+NBVALUES = 100000
+# The number of moves sent through the GUI queue by a transport measure
+NBMESSAGES = 100000
+# The file where the results are written
+OUTPUT = 'benchmark.json'
+# The baseline results to compare with. Set to 'None' to disable the comparison.
+BASELINE = 'benchmark_baseline.json'
+# The relative slowdown from the baseline reported as a regression
+TOLERANCE = DEF_TOLERANCE
+# **************************************************************************************************
+if __name__ == '__main__':
+    print("# Walks...")
+    RATES = benchWalks(LENGTHS, REJECTIONLENGTHS, NBSTEPS)
+    print("# Generators...")
+    RATES.update(benchGenerators(NBVALUES))
+    print("# Transport...")
+    RATES.update(benchTransport(NBMESSAGES))
+    writeResults(OUTPUT, RATES)
+    try:
+        BASE = {} if BASELINE is None else readRates(BASELINE)
+    except FileNotFoundError:
+        print("# No baseline found, copy", OUTPUT, "to", BASELINE, "to create it")
+        BASE = {}
+    # Exits with an error status on regressions, to be usable in scripts
+    if compareRates(RATES, BASE, TOLERANCE):
+        sys.exit(1)
@@ -0,0 +1,32 @@
+"""Pseudo random numbers served from a pre-filled buffer."""
+
+from array import array
+
+DEF_BLOCK_SIZE = 4096
+
+class BufferedGenerator(object):
+    """Serves the numbers of a generator from blocks generated at once."""
+
+    # Constructor
+    def __init__(self, generator, blockSize=DEF_BLOCK_SIZE):
+        self.generator = generator
+        self.blockSize = blockSize
+        self.block = array('d')
+        self.index = 0
+
+    def generate(self):
+        """Returns the next pseudo random number of the buffer, refilling it if needed."""
+        if self.index == len(self.block):
+            self.block = self.generator.generateBlock(self.blockSize)
+            self.index = 0
+        value = self.block[self.index]
+        self.index += 1
+        return value
+
+    def generateBlock(self, n):
+        """Returns the next n pseudo random numbers, in an array of doubles."""
+        block = self.block[self.index:self.index+n]
+        self.index += len(block)
+        if len(block) < n:
+            block.extend(self.generator.generateBlock(n - len(block)))
+        return block
@@ -0,0 +1,111 @@
+"""Uniform direction choices, sliced two bits at a time from random words."""
+
+from random import getrandbits
+
+# Default number of codes decoded at once
+DEF_BLOCK_SIZE = 4096
+# The four 2-bit codes of each byte, lowest bits first
+CODES = [bytes((byte >> shift) & 3 for shift in (0, 2, 4, 6)) for byte in range(256)]
+# Code dropped to choose among 3 codes (exact rejection)
+REJECTED = b'\x03'
+
+class DirectionSource(object):
+    """Choices among a few directions, from the native generator or a custom one (generateInt)."""
+
+    # Constructor
+    def __init__(self, generator=None, blockSize=DEF_BLOCK_SIZE):
+        self.generator = generator
+        self.blockSize = blockSize
+        # Random bits not used yet (custom generators), and their number
+        self.bits = 0
+        self.nbBits = 0
+        # Decoded choices among 4 and among 3, and the index of the next one
+        self.quads = b''
+        self.quadIndex = 0
+        self.triples = b''
+        self.tripleIndex = 0
+        # Number of random words drawn
+        self.nbWords = 0
+
+    def randomBytes(self, n):
+        """Returns n uniform random bytes."""
+        if n == 0:
+            return b''
+        if self.generator is None:
+            self.nbWords += (8*n + 31) // 32
+            return getrandbits(8 * n).to_bytes(n, 'little')
+        size = self.generator.intRange()
+        while self.nbBits < 8 * n:
+            value, nbBits = uniformBits(self.generator.generateInt(), size)
+            self.bits |= value << self.nbBits
+            self.nbBits += nbBits
+            self.nbWords += 1
+        data = (self.bits & ((1 << 8*n) - 1)).to_bytes(n, 'little')
+        self.bits >>= 8 * n
+        self.nbBits -= 8 * n
+        return data
+
+    def decode(self, n):
+        """Returns at least n uniform codes among 4 (0-3), as bytes."""
+        return b''.join([CODES[byte] for byte in self.randomBytes((n + 3) // 4)])
+
+    def codes(self, n):
+        """Returns n uniform codes among 4, as bytes."""
+        if self.quadIndex + n > len(self.quads):
+            self.quads = self.quads[self.quadIndex:] + self.decode(max(n, self.blockSize))
+            self.quadIndex = 0
+        codes = self.quads[self.quadIndex:self.quadIndex + n]
+        self.quadIndex += n
+        return codes
+
+    def turns(self, n):
+        """Returns n uniform codes among 3 (0-2), as bytes."""
+        while self.tripleIndex + n > len(self.triples):
+            self.triples = self.triples[self.tripleIndex:]\
+            + self.decode(max(n, self.blockSize)).translate(None, REJECTED)
+            self.tripleIndex = 0
+        turns = self.triples[self.tripleIndex:self.tripleIndex + n]
+        self.tripleIndex += n
+        return turns
+
+    def pick(self, n):
+        """Returns a uniform integer in [0, n)."""
+        if n == 4:
+            if self.quadIndex == len(self.quads):
+                self.quads = self.decode(self.blockSize)
+                self.quadIndex = 0
+            self.quadIndex += 1
+            return self.quads[self.quadIndex - 1]
+        elif n == 3:
+            if self.tripleIndex == len(self.triples):
+                self.triples = self.decode(self.blockSize).translate(None, REJECTED)
+                self.tripleIndex = 0
+            self.tripleIndex += 1
+            return self.triples[self.tripleIndex - 1]
+        elif n == 2:
+            return self.pick(4) & 1
+        elif n == 1:
+            return 0
+        # Larger choices : as many codes as needed, and rejection of the values out of range
+        nbCodes = ((n - 1).bit_length() + 1) // 2
+        while True:
+            value = 0
+            for code in self.codes(nbCodes):
+                value = value << 2 | code
+            if value < n:
+                return value
+
+    def generate(self):
+        """Returns a uniform number in [0, 1), made of 53 random bits."""
+        return (int.from_bytes(self.randomBytes(7), 'little') >> 3) / (1 << 53)
+
+def uniformBits(value, size):
+    """Returns (bits, number of bits) uniform, from a value uniform in [0, size)."""
+    # [0, size) is split in blocks whose sizes are the powers of two of size : in the block of the
+    # value, its offset is uniform
+    block = 1 << (size.bit_length() - 1)
+    while value >= block:
+        value -= block
+        size -= block
+        block = 1 << (size.bit_length() - 1)
+    return value, block.bit_length() - 1
@@ -0,0 +1,283 @@
+"""Append-only, memory-mapped store of walk ensembles, for analyses without re-simulating."""
+
+import os
+import json
+from itertools import islice
+
+import numpy as np
+
+from Walk import WalkType
+from Trajectory import Trajectory, STEPS
+
+VERSION = 1
+# Files of a store (in its directory) : metadata, fixed size record of each walk, packed steps
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.bin'
+STEPS_FILE = 'steps.bin'
+# Record of a walk : start and end points, weight, offset and number of steps in the steps file
+RECORD = np.dtype([('start', '<i8', (2,)), ('end', '<i8', (2,)), ('weight', '<f8'),\
+('offset', '<u8'), ('length', '<u8')])
+# Default number of records kept in memory before being written
+DEF_FLUSH_SIZE = 4096
+
+# Step vector of each direction code
+STEP_VECTORS = np.array(STEPS, dtype=np.int64)
+# Walk types whose steps can be kept (PERM only gives the end points of its walks)
+STEP_TYPES = (WalkType.RANDOM, WalkType.NON_REVERSING, WalkType.SELF_AVOIDING, WalkType.PIVOT,\
+WalkType.ROSENBLUTH)
+
+class EnsembleStore(object):
+    """Walks of an ensemble : end points always, full steps optionally, read as NumPy views."""
+
+    # Constructor
+    def __init__(self, directory, writable=False, flushSize=DEF_FLUSH_SIZE):
+        self.directory = directory
+        self.writable = writable
+        self.flushSize = flushSize
+        with open(self.path(META_FILE)) as source:
+            self.meta = json.load(source)
+        if self.meta.get('version') != VERSION:
+            raise ValueError("unsupported ensemble store version")
+        self.walkType = WalkType[self.meta['walkType']]
+        self.storesSteps = self.meta['steps']
+        # A record interrupted while being written is dropped
+        size = os.path.getsize(self.path(INDEX_FILE))
+        if writable and size % RECORD.itemsize:
+            os.truncate(self.path(INDEX_FILE), size - size % RECORD.itemsize)
+        self.nbStored = size // RECORD.itemsize
+        self.stepsSize = os.path.getsize(self.path(STEPS_FILE))
+        # Records and steps waiting to be written
+        self.pending = []
+        self.pendingSteps = []
+        # Memory maps, created on the first read
+        self.index = None
+        self.steps = None
+
+    def __len__(self):
+        return self.nbStored + len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def path(self, name):
+        """Returns the path of a file of the store."""
+        return os.path.join(self.directory, name)
+
+    def addBatch(self, walkType, nbSteps, generator=None, seed=None, **params):
+        """Records the origin of the walks appended from now on, refusing a different ensemble."""
+        if not self.writable:
+            raise ValueError("the ensemble store is read-only")
+        # Walks of another distribution (type, length, backtrack...) can not be mixed
+        if walkType != self.walkType or nbSteps != self.meta['nbSteps'] or\
+        toJson(params) != self.meta['params']:
+            raise ValueError("the store holds {} walks of {} steps with {}".format(\
+            self.meta['walkType'], self.meta['nbSteps'], self.meta['params']))
+        batch = {'first': len(self), 'generator': toJson(describeGenerator(generator)),\
+        'seed': seed}
+        # A seeded generator would give the same walks again
+        if seed is not None or batch['generator'] is not None:
+            for other in self.meta['batches']:
+                if (other['generator'], other['seed']) == (batch['generator'], seed):
+                    raise ValueError("walks from the same generator and seed are already stored")
+        self.meta['batches'].append(batch)
+        writeMeta(self.directory, self.meta)
+
+    # ============================================ WRITING =========================================
+    def append(self, startPoint, endPoint, weight=1.0, trajectory=None):
+        """Adds a walk, with its steps (a Trajectory) if the store keeps them."""
+        if not self.writable:
+            raise ValueError("the ensemble store is read-only")
+        offset = self.stepsSize + sum(len(data) for data in self.pendingSteps)
+        length = 0
+        if self.storesSteps and trajectory is not None:
+            self.pendingSteps.append(bytes(trajectory.data))
+            length = len(trajectory)
+        self.pending.append((startPoint, endPoint, weight, offset, length))
+        if len(self.pending) >= self.flushSize:
+            self.flush()
+
+    def appendArrays(self, endPoints, weights=None, startPoint=(0, 0)):
+        """Adds walks given by their end points (an (n, 2) array), without steps."""
+        if not self.writable:
+            raise ValueError("the ensemble store is read-only")
+        self.flush()
+        records = np.zeros(len(endPoints), dtype=RECORD)
+        records['start'] = startPoint
+        records['end'] = endPoints
+        records['weight'] = 1.0 if weights is None else weights
+        records['offset'] = self.stepsSize
+        self.write(records)
+
+    def flush(self):
+        """Writes the pending walks."""
+        if not self.pending:
+            return
+        # The steps are written first, so that a record never refers to missing steps
+        if self.pendingSteps:
+            data = b''.join(self.pendingSteps)
+            with open(self.path(STEPS_FILE), 'ab') as output:
+                output.write(data)
+            self.stepsSize += len(data)
+        self.write(np.array(self.pending, dtype=RECORD))
+        self.pending = []
+        self.pendingSteps = []
+
+    def write(self, records):
+        """Appends records to the index file."""
+        with open(self.path(INDEX_FILE), 'ab') as output:
+            output.write(records.tobytes())
+        self.nbStored += len(records)
+
+    def close(self):
+        """Writes the pending walks, and releases the memory maps."""
+        if self.writable:
+            self.flush()
+        self.index = None
+        self.steps = None
+
+    # ============================================ READING =========================================
+    def records(self):
+        """Returns the records of the walks, as a read-only memory-mapped array."""
+        if self.writable:
+            self.flush()
+        if self.index is None or len(self.index) != self.nbStored:
+            self.index = mapFile(self.path(INDEX_FILE), RECORD, self.nbStored)
+        return self.index
+
+    def endPoints(self):
+        """Returns the end points of the walks, as a (n, 2) view."""
+        return self.records()['end']
+
+    def weights(self):
+        """Returns the weights of the walks (0 for a trapped walk)."""
+        return self.records()['weight']
+
+    def distances(self):
+        """Returns the distances from start to end of the walks."""
+        records = self.records()
+        return np.hypot(*(records['end'] - records['start']).T)
+
+    def packedSteps(self, i):
+        """Returns the packed steps (4 per byte) of the i-th walk, as a view of the steps file."""
+        record = self.records()[i]
+        if self.steps is None or len(self.steps) < self.stepsSize:
+            self.steps = mapFile(self.path(STEPS_FILE), np.uint8, self.stepsSize)
+        offset = int(record['offset'])
+        return self.steps[offset:offset + (int(record['length']) + 3) // 4]
+
+    def codes(self, i):
+        """Returns the direction codes of the steps of the i-th walk."""
+        packed = self.packedSteps(i)
+        codes = (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+        return codes.reshape(-1)[:int(self.records()[i]['length'])]
+
+    def points(self, i):
+        """Returns the points of the i-th walk, as a (length + 1, 2) array."""
+        start = self.records()[i]['start']
+        steps = STEP_VECTORS[self.codes(i)]
+        return np.concatenate((start[None, :], start + np.cumsum(steps, axis=0)))
+
+    def trajectory(self, i):
+        """Returns the i-th walk as a Trajectory."""
+        record = self.records()[i]
+        trajectory = Trajectory(tuple(record['start']))
+        trajectory.data = bytearray(self.packedSteps(i))
+        trajectory.length = int(record['length'])
+        trajectory.endPoint = tuple(int(c) for c in record['end'])
+        return trajectory
+
+def create(directory, walkType, nbSteps, steps=False, generator=None, seed=None, **params):
+    """Creates an empty store, returns it opened for writing."""
+    if steps and walkType not in STEP_TYPES:
+        raise ValueError("the steps of {} walks can not be kept".format(walkType.name))
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, META_FILE)):
+        raise FileExistsError("an ensemble store already exists in " + directory)
+    # Each batch of appended walks has its own generator and seed
+    meta = {'version': VERSION, 'walkType': walkType.name, 'nbSteps': nbSteps, 'steps': steps,\
+    'params': toJson(params), 'batches': [{'first': 0,\
+    'generator': toJson(describeGenerator(generator)), 'seed': seed}]}
+    for name in (INDEX_FILE, STEPS_FILE):
+        open(os.path.join(directory, name), 'wb').close()
+    # The metadata is written last : a store without it is incomplete
+    writeMeta(directory, meta)
+    return EnsembleStore(directory, writable=True)
+
+def writeMeta(directory, meta):
+    """Writes the metadata of a store, replacing the previous one at once."""
+    temp = os.path.join(directory, META_FILE + '.tmp')
+    with open(temp, 'w') as output:
+        json.dump(meta, output, indent=2)
+    os.replace(temp, os.path.join(directory, META_FILE))
+
+def toJson(value):
+    """Returns a value as read back from JSON (unknown types as their repr)."""
+    return json.loads(json.dumps(value, default=repr))
+
+def describeGenerator(generator):
+    """Returns the class and the initial state of a generator, as JSON values."""
+    if generator is None:
+        return None
+    # Wrappers (buffered generator, direction source) are described by the generator they wrap
+    if hasattr(generator, 'generator'):
+        return [type(generator).__name__, describeGenerator(generator.generator)]
+    return [type(generator).__name__, vars(generator)]
+
+def mapFile(path, dtype, count):
+    """Maps the first count items of a file, read-only (an empty array if count is 0)."""
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+# ============================================ RECORDING ===========================================
+def sampleWalks(walkType, nbSteps, nbWalks, backtrack=False, generator=None, steps=False):
+    """Generates walks, yields their (arrival, weight, trajectory or None) one by one."""
+    # Imported here, to avoid loading the samplers with the store
+    from Results import WALKS, SAMPLERS
+    from WeightedWalk import rosenbluthWalk
+    from PivotWalk import pivotChain
+    if steps and walkType not in STEP_TYPES:
+        raise ValueError("the steps of {} walks can not be kept".format(walkType.name))
+    startPoint = (0, 0)
+    if walkType == WalkType.PIVOT:
+        # The walks are taken from a single pivot chain, equilibrated once
+        for walk in islice(pivotChain(startPoint, nbSteps, generator), nbWalks):
+            trajectory = None
+            if steps:
+                trajectory = Trajectory(startPoint)
+                walk.notify(trajectory)
+            yield walk.arrival(), 1.0, trajectory
+        return
+    if not steps and walkType in SAMPLERS:
+        for arrival, weight in SAMPLERS[walkType](startPoint, nbSteps, nbWalks, generator):
+            # Trapped walks have a null weight, and no arrival
+            yield (arrival if weight > 0 else startPoint), weight, None
+        return
+    for _ in range(nbWalks):
+        # The steps are recorded by a Trajectory, given to the walk as its model
+        trajectory = Trajectory(startPoint) if steps else None
+        weight = 1.0
+        if walkType == WalkType.ROSENBLUTH:
+            arrival, weight = rosenbluthWalk(startPoint, nbSteps, trajectory, generator)
+        elif walkType in WALKS:
+            arrival = None
+            while arrival is None:
+                trajectory = Trajectory(startPoint) if steps else None
+                if walkType == WalkType.SELF_AVOIDING:
+                    arrival = WALKS[walkType](startPoint, nbSteps, backtrack, trajectory, generator)
+                else:
+                    arrival = WALKS[walkType](startPoint, nbSteps, trajectory, generator)
+        else:
+            raise ValueError("the steps of {} walks can not be kept".format(walkType.name))
+        if arrival is None:
+            arrival = startPoint if trajectory is None else trajectory.endPoint
+        yield arrival, weight, trajectory
+
+def recordWalks(store, nbSteps, nbWalks, backtrack=False, generator=None):
+    """Generates walks of the type of a store, and adds them to it."""
+    for arrival, weight, trajectory in sampleWalks(store.walkType, nbSteps, nbWalks, backtrack,\
+    generator, store.storesSteps):
+        store.append((0, 0), arrival, weight, trajectory)
@@ -0,0 +1,113 @@
+"""Exact enumeration of the self avoiding walks of a few steps."""
+
+from math import sqrt
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from Walk import Direction, initDir, opposite, move
+
+# Default length of the walks from which the enumeration is split in tasks
+DEF_SPLIT_DEPTH = 8
+
+# Step vector of each direction, and the directions which can follow each direction
+STEPS = {di: move((0, 0), di, 1) for di in Direction}
+NEXT = {di: [(nextDi,) + STEPS[nextDi] for nextDi in initDir(opposite(di))] for di in Direction}
+
+# ============================================ SEARCH ==============================================
+def growPrefixes(points, occupied, last, turned, depth, tables, prefixes):
+    """Lists the walks of depth steps going first to the east then turning first to the north."""
+    length = len(points) - 1
+    if length == depth:
+        if turned:
+            prefixes.append((tuple(points), last))
+        return
+    # The other walks are obtained with the lattice symmetries
+    if turned:
+        directions = initDir(opposite(last))
+    elif last is None:
+        directions = [Direction.EAST]
+    else:
+        directions = [Direction.EAST, Direction.NORTH]
+    for di in directions:
+        point = move(points[-1], di, 1)
+        if point not in occupied:
+            points.append(point)
+            occupied.add(point)
+            # The shorter walks are counted here, the longer ones by the tasks
+            if (turned or di == Direction.NORTH) and length + 1 < depth:
+                addWalk(tables, length + 1, point)
+            growPrefixes(points, occupied, di, turned or di == Direction.NORTH, depth, tables,\
+            prefixes)
+            occupied.discard(points.pop())
+
+def extendPrefix(prefix, nbSteps):
+    """Counts the walks of up to nbSteps steps starting with a prefix (a task of the search)."""
+    points, last = prefix
+    tables = newTables(nbSteps)
+    length = len(points) - 1
+    addWalk(tables, length, points[-1])
+    if length < nbSteps:
+        x, y = points[-1]
+        extend(x, y, last, nbSteps - length, length + 1, set(points), tables)
+    return tables
+
+def extend(x, y, last, remaining, length, occupied, tables):
+    """Counts the walks extending the current one by up to remaining steps (depth first)."""
+    counts, squares, distances = tables
+    for di, dx, dy in NEXT[last]:
+        point = (x + dx, y + dy)
+        if point not in occupied:
+            square = point[0]*point[0] + point[1]*point[1]
+            counts[length] += 1
+            squares[length] += square
+            distances[length] += sqrt(square)
+            if remaining > 1:
+                occupied.add(point)
+                extend(point[0], point[1], di, remaining - 1, length + 1, occupied, tables)
+                occupied.discard(point)
+
+# ============================================= TABLES =============================================
+def newTables(nbSteps):
+    """Creates the tables of the number of walks, sum of R^2 and sum of R, for each length."""
+    return [0] * (nbSteps + 1), [0] * (nbSteps + 1), [0.0] * (nbSteps + 1)
+
+def addWalk(tables, length, arrival):
+    """Adds a walk, starting from (0, 0), to the tables."""
+    square = arrival[0]*arrival[0] + arrival[1]*arrival[1]
+    tables[0][length] += 1
+    tables[1][length] += square
+    tables[2][length] += sqrt(square)
+
+def mergeTables(tables, other):
+    """Adds the walks of other tables."""
+    for table, otherTable in zip(tables, other):
+        for length, value in enumerate(otherTable):
+            table[length] += value
+
+def enumerateWalks(nbSteps, nbWorkers=None, splitDepth=DEF_SPLIT_DEPTH):
+    """Enumerates the self avoiding walks, returns (length, count, mean R^2, mean R) tuples."""
+    tables = newTables(nbSteps)
+    prefixes = []
+    depth = min(splitDepth, nbSteps)
+    growPrefixes([(0, 0)], {(0, 0)}, None, False, depth, tables, prefixes)
+    # Walks going straight for depth steps or more before turning
+    for length in range(depth, nbSteps):
+        prefixes.append((tuple((i, 0) for i in range(length + 1)) + ((length, 1),),\
+        Direction.NORTH))
+    if nbWorkers is None:
+        for other in map(extendPrefix, prefixes, repeat(nbSteps)):
+            mergeTables(tables, other)
+    else:
+        with ProcessPoolExecutor(nbWorkers) as pool:
+            chunkSize = max(1, len(prefixes) // (8 * nbWorkers))
+            for other in pool.map(extendPrefix, prefixes, repeat(nbSteps), chunksize=chunkSize):
+                mergeTables(tables, other)
+    counts, squares, distances = tables
+    rows = [(0, 1, 0.0, 0.0)]
+    for length in range(1, nbSteps + 1):
+        # Each walk turning first to the north stands for 8 walks, and the straight walk for 4
+        count = 8 * counts[length] + 4
+        rows.append((length, count, (8 * squares[length] + 4 * length * length) / count,\
+        (8 * distances[length] + 4 * length) / count))
+    return rows
+# ==================================================================================================
@@ -0,0 +1,223 @@
+"""Spatial densities of walk ensembles : end points and visited sites binned in 2-D histograms."""
+
+import zlib
+import struct
+from random import Random, seed as seedNative
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.random import default_rng
+
+from Walk import WalkType
+from BatchWalk import batchWalk, DRAWS
+from EnsembleStore import sampleWalks
+
+# Default number of walks simulated at once, and computed by a task of a parallel run
+DEF_BATCH_SIZE = 10000
+# Default number of stored walks read at once
+DEF_CHUNK_SIZE = 65536
+
+class Heatmap(object):
+    """Weighted 2-D histogram of points, on a square grid of given radius around the start."""
+
+    # Constructor
+    def __init__(self, radius, startPoint=(0, 0)):
+        self.radius = radius
+        self.startPoint = (int(startPoint[0]), int(startPoint[1]))
+        # Weight of each cell, the row being y and the column x (from the bottom left corner)
+        self.counts = np.zeros((2*radius + 1, 2*radius + 1))
+        # Number and total weight of the walks, weight of the points out of the grid
+        self.nbWalks = 0
+        self.weight = 0.0
+        self.outside = 0.0
+
+    def addPoints(self, points, weights=None):
+        """Bins points (an (n, 2) array), with their weights (1 by default)."""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        size = 2*self.radius + 1
+        x = points[:, 0] - (self.startPoint[0] - self.radius)
+        y = points[:, 1] - (self.startPoint[1] - self.radius)
+        weights = np.ones(len(points)) if weights is None else\
+        np.broadcast_to(np.asarray(weights, dtype=float), (len(points),))
+        inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+        self.outside += float(weights[~inside].sum())
+        self.counts += np.bincount(y[inside]*size + x[inside], weights=weights[inside],\
+        minlength=size*size).reshape(size, size)
+
+    def addWalks(self, endPoints, weights=None):
+        """Bins the end points of walks (an (n, 2) array)."""
+        self.addPoints(endPoints, weights)
+        self.nbWalks += len(endPoints)
+        self.weight += len(endPoints) if weights is None else float(np.sum(weights))
+
+    def addPaths(self, paths, weights=None):
+        """Bins every visit of the points of walks (an (n, steps + 1, 2) array)."""
+        paths = np.asarray(paths)
+        if weights is not None:
+            weights = np.repeat(np.asarray(weights, dtype=float), paths.shape[1])
+        self.addPoints(paths.reshape(-1, 2), weights)
+        self.nbWalks += len(paths)
+        self.weight += len(paths) if weights is None else float(weights.sum()) / paths.shape[1]
+
+    def merge(self, other):
+        """Adds the points of another heatmap (of the same grid)."""
+        if other.radius != self.radius or other.startPoint != self.startPoint:
+            raise ValueError("heatmaps of different grids can not be merged")
+        self.counts += other.counts
+        self.nbWalks += other.nbWalks
+        self.weight += other.weight
+        self.outside += other.outside
+
+    def density(self):
+        """Returns the weight of each cell per walk."""
+        return self.counts / self.weight if self.weight > 0 else self.counts.copy()
+
+    def image(self, log=True):
+        """Returns the heatmap as 8-bit gray levels, the top row being the highest y."""
+        values = np.log1p(self.counts) if log else self.counts
+        top = values.max()
+        levels = values * (255 / top) if top > 0 else values
+        return np.flipud(np.rint(levels).astype(np.uint8))
+
+    def savePGM(self, path, log=True):
+        """Writes the heatmap as a binary PGM image."""
+        image = self.image(log)
+        with open(path, 'wb') as output:
+            output.write("P5\n{} {}\n255\n".format(image.shape[1], image.shape[0]).encode())
+            output.write(image.tobytes())
+
+    def savePNG(self, path, log=True):
+        """Writes the heatmap as a gray level PNG image."""
+        image = self.image(log)
+        # Each row starts with its filter type (0 : none)
+        rows = np.concatenate((np.zeros((image.shape[0], 1), dtype=np.uint8), image), axis=1)
+        header = struct.pack('>IIBBBBB', image.shape[1], image.shape[0], 8, 0, 0, 0, 0)
+        with open(path, 'wb') as output:
+            output.write(b'\x89PNG\r\n\x1a\n')
+            for tag, data in ((b'IHDR', header), (b'IDAT', zlib.compress(rows.tobytes())),\
+            (b'IEND', b'')):
+                output.write(struct.pack('>I', len(data)) + tag + data)
+                output.write(struct.pack('>I', zlib.crc32(tag + data)))
+
+    def save(self, path):
+        """Writes the histogram and its totals in a NPZ archive."""
+        np.savez_compressed(path, counts=self.counts, radius=self.radius,\
+        startPoint=self.startPoint, totals=[self.nbWalks, self.weight, self.outside])
+
+def load(path):
+    """Reads a heatmap written by Heatmap.save."""
+    with np.load(path) as archive:
+        heatmap = Heatmap(int(archive['radius']), tuple(archive['startPoint']))
+        heatmap.counts = archive['counts']
+        nbWalks, heatmap.weight, heatmap.outside = archive['totals']
+        heatmap.nbWalks = int(nbWalks)
+    return heatmap
+
+# ============================================= BUILDING ===========================================
+def walkHeatmap(walkType, nbSteps, nbWalks, radius, visited=False, backtrack=True, rng=None,\
+generator=None, heatmap=None, batchSize=DEF_BATCH_SIZE):
+    """Bins the end points (or visited sites) of new walks of a walk type."""
+    if heatmap is None:
+        heatmap = Heatmap(radius)
+    startPoint = heatmap.startPoint
+    # Random and non reversing walks are simulated by batches, the others one by one
+    if walkType in DRAWS and generator is None:
+        for first in range(0, nbWalks, batchSize):
+            count = min(batchSize, nbWalks - first)
+            if visited:
+                heatmap.addPaths(batchWalk(walkType, startPoint, nbSteps, count, True, rng)[1])
+            else:
+                heatmap.addWalks(batchWalk(walkType, startPoint, nbSteps, count, rng=rng))
+        return heatmap
+    ends = []
+    weights = []
+    for arrival, weight, trajectory in sampleWalks(walkType, nbSteps, nbWalks, backtrack,\
+    generator, visited):
+        if visited:
+            points = np.array(list(trajectory.points())) + startPoint
+            heatmap.addPoints(points, weight)
+            heatmap.nbWalks += 1
+            heatmap.weight += weight
+        else:
+            ends.append((arrival[0] + startPoint[0], arrival[1] + startPoint[1]))
+            weights.append(weight)
+            if len(ends) >= batchSize:
+                heatmap.addWalks(ends, weights)
+                ends, weights = [], []
+    if ends:
+        heatmap.addWalks(ends, weights)
+    return heatmap
+
+def storeHeatmap(store, radius, visited=False, heatmap=None, chunkSize=DEF_CHUNK_SIZE):
+    """Bins the end points (or visited sites, if the steps are stored) of the walks of a store."""
+    if heatmap is None:
+        heatmap = Heatmap(radius)
+    if visited:
+        for i in range(len(store)):
+            heatmap.addPoints(store.points(i), store.weights()[i])
+            heatmap.nbWalks += 1
+            heatmap.weight += float(store.weights()[i])
+        return heatmap
+    records = store.records()
+    # Reads the memory-mapped records by chunks, not all at once
+    for first in range(0, len(records), chunkSize):
+        chunk = records[first:first + chunkSize]
+        heatmap.addWalks(chunk['end'], chunk['weight'])
+    return heatmap
+
+def buildTasks(walkTypes, nbSteps, nbWalks, radius, visited, backtrack, batchSize, seed=0):
+    """Splits the walks of each walk type in deterministic tasks."""
+    tasks = []
+    for walkType in walkTypes:
+        for first in range(0, nbWalks, batchSize):
+            # Each task has its own seed, whatever the worker running it
+            taskSeed = "heatmap/{}/{}/{}/{}".format(seed, walkType.name, nbSteps, first)
+            tasks.append((walkType, nbSteps, min(batchSize, nbWalks - first), radius, visited,\
+            backtrack, taskSeed))
+    return tasks
+
+def runTask(task):
+    """Computes the heatmap of a task."""
+    walkType, nbSteps, nbWalks, radius, visited, backtrack, taskSeed = task
+    seedNative(taskSeed)
+    rng = default_rng(Random(taskSeed).getrandbits(64))
+    return walkHeatmap(walkType, nbSteps, nbWalks, radius, visited, backtrack, rng)
+
+def buildHeatmaps(walkTypes, nbSteps, nbWalks, radius, visited=False, backtrack=True,\
+nbWorkers=None, batchSize=DEF_BATCH_SIZE, seed=0):
+    """Computes the heatmap of each walk type, on a pool of processes if nbWorkers is given."""
+    heatmaps = {walkType: Heatmap(radius) for walkType in walkTypes}
+    tasks = buildTasks(walkTypes, nbSteps, nbWalks, radius, visited, backtrack, batchSize, seed)
+    if nbWorkers is None:
+        results = map(runTask, tasks)
+        for task, heatmap in zip(tasks, results):
+            heatmaps[task[0]].merge(heatmap)
+    else:
+        with ProcessPoolExecutor(nbWorkers) as pool:
+            # Merged in the tasks order, so the result does not depend on the number of workers
+            for task, heatmap in zip(tasks, pool.map(runTask, tasks)):
+                heatmaps[task[0]].merge(heatmap)
+    return heatmaps
+
+# ********************************** MODIFY ONLY THESE PARAMETERS **********************************
+# The walk types to compare
+WALKTYPES = [WalkType.RANDOM, WalkType.NON_REVERSING, WalkType.SELF_AVOIDING]
+# The number of steps of each walk, and the number of walks of each walk type
+NBSTEPS = 100
+NBWALKS = 100000
+# The half width of the images, in lattice steps
+RADIUS = 60
+# Set to True to bin all the visited sites, instead of the end points only
+VISITED = False
+# The number of worker processes. Set to 'None' to compute in the main process.
+NBWORKERS = None
+# The prefix of the written files ('<prefix>_<walk type>.png' and '.npz')
+OUTPUT = 'heatmap'
+# **************************************************************************************************
+if __name__ == '__main__':
+    HEATMAPS = buildHeatmaps(WALKTYPES, NBSTEPS, NBWALKS, RADIUS, VISITED, nbWorkers=NBWORKERS)
+    for WALKTYPE, HEATMAP in HEATMAPS.items():
+        HEATMAP.savePNG("{}_{}.png".format(OUTPUT, WALKTYPE.name.lower()))
+        HEATMAP.save("{}_{}.npz".format(OUTPUT, WALKTYPE.name.lower()))
+        print(WALKTYPE.name, ":", HEATMAP.nbWalks, "walks,", HEATMAP.outside / HEATMAP.weight,\
+        "of the weight out of the image")
@@ -1,5 +1,7 @@
 """Pseudo random congruential generator, using one term reccurence."""
 
+from array import array
+
 DEF_MOD_VAL = 2147483647
 DEF_MULT_VAL = 16807
 DEF_SEED_VAL = 10
@@ -56,3 +58,62 @@ class OneTermGenerator(object):
         """Generates a pseudo random number."""
         self.seed = self.mult * self.seed % self.mod
         return self.seed / self.mod
+
+    def generateBlock(self, n):
+        """Generates n pseudo random numbers at once, in an array of doubles."""
+        block = array('d')
+        append = block.append
+        mult, mod, seed = self.mult, self.mod, self.seed
+        for _ in range(n):
+            seed = mult * seed % mod
+            append(seed / mod)
+        self.seed = seed
+        return block
+
+    def generateInt(self):
+        """Generates a pseudo random integer, uniform in [0, intRange())."""
+        self.seed = self.mult * self.seed % self.mod
+        return self.seed - 1
+
+    def intRange(self):
+        """Returns the number of integers generateInt can return."""
+        # The seed never reaches 0
+        return self.mod - 1
+
+    def jumpAhead(self, n):
+        """Advances the generator by n numbers, in O(log n) operations."""
+        self.seed = pow(self.mult, n, self.mod) * self.seed % self.mod
+
+    def substream(self, i, length):
+        """Returns a new generator, starting at the i-th segment of given length of the sequence."""
+        stream = OneTermGenerator(self.mod, self.mult, self.seed)
+        stream.jumpAhead(i * length)
+        return stream
+
+    def period(self):
+        """Returns the period of the sequence : the order of the multiplier modulo m."""
+        # The order divides m-1, removes the prime factors as long as the power stays equal to 1
+        period = self.mod - 1
+        for factor in primeFactors(period):
+            while period % factor == 0 and pow(self.mult, period // factor, self.mod) == 1:
+                period //= factor
+        return period
+
+    def split(self, k):
+        """Splits the sequence in k non-overlapping substreams."""
+        length = self.period() // k
+        return [self.substream(i, length) for i in range(k)]
+
+def primeFactors(n):
+    """Returns the distinct prime factors of n, by trial division."""
+    factors = []
+    factor = 2
+    while factor * factor <= n:
+        if n % factor == 0:
+            factors.append(factor)
+            while n % factor == 0:
+                n //= factor
+        factor += 1
+    if n > 1:
+        factors.append(n)
+    return factors
@@ -0,0 +1,160 @@
+"""Self avoiding walks sampled with the pivot algorithm."""
+
+from time import perf_counter
+from random import getstate, setstate, seed
+from itertools import islice
+
+import WalkStats
+from Walk import pickDirection, towards, notifyModel
+
+# Default number of pivot attempts per step before the first sample (starting from a straight rod).
+# An accepted attempt moves up to half of the walk, so that the equilibration costs about
+# nbSteps^2 (0.2-0.5 s for 10^3 steps, 15-35 s for 10^4 steps) : it is run once per process.
+DEF_EQUILIBRATION = 5
+# Default number of pivot attempts between two samples
+DEF_DECORRELATION = 20
+# Number of decorrelations run by a chain started from the equilibrated walk, before its first
+# sample
+DEF_RESTART = 10
+
+# Equilibrated walks of the process, by (number of steps, number of pivot attempts)
+EQUILIBRATED = {}
+
+# Lattice symmetries other than the identity, as (a, b, c, d) : (x, y) -> (ax + by, cx + dy)
+SYMMETRIES = [(0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),\
+(1, 0, 0, -1), (-1, 0, 0, 1), (0, 1, 1, 0), (0, -1, -1, 0)]
+
+class PivotWalk(object):
+    """Markov chain on the self avoiding walks of a given length."""
+
+    # Constructor
+    def __init__(self, startPoint, nbSteps, generator=None):
+        self.startPoint = startPoint
+        self.nbSteps = nbSteps
+        self.generator = generator
+        # Starts from a straight rod
+        x, y = startPoint
+        self.points = [(x+i, y) for i in range(nbSteps+1)]
+        # Occupied points, with their index in the walk
+        self.occupied = {p: i for i, p in enumerate(self.points)}
+
+    def pivot(self):
+        """Attempts a pivot move, returns True if it was accepted."""
+        points = self.points
+        getIndex = self.occupied.get
+        nbSteps = self.nbSteps
+        if nbSteps < 2:
+            return False
+        k = pickDirection(range(1, nbSteps), self.generator)
+        a, b, c, d = pickDirection(SYMMETRIES, self.generator)
+        px, py = points[k]
+        # Transforms the shortest side of the walk around the pivot, the other side stays fixed.
+        # Both choices give the same walk up to a global symmetry.
+        headMoved = k <= nbSteps - k
+        if headMoved:
+            moved = range(k-1, -1, -1)
+        else:
+            moved = range(k+1, nbSteps+1)
+        newPoints = []
+        # Starts next to the pivot, where collisions are the most likely
+        for i in moved:
+            x, y = points[i]
+            x -= px
+            y -= py
+            newPoint = (px + a*x + b*y, py + c*x + d*y)
+            j = getIndex(newPoint)
+            if j is not None and (j >= k if headMoved else j <= k):
+                return False
+            newPoints.append(newPoint)
+        occupied = self.occupied
+        for i in moved:
+            del occupied[points[i]]
+        for i, newPoint in zip(moved, newPoints):
+            points[i] = newPoint
+            occupied[newPoint] = i
+        return True
+
+    def sample(self, nbPivots):
+        """Attempts several pivot moves, returns the number of accepted ones."""
+        stats = WalkStats.ACTIVE
+        if stats is not None:
+            start = perf_counter()
+        accepted = 0
+        for _ in range(nbPivots):
+            if self.pivot():
+                accepted += 1
+        if stats is not None:
+            # A pivot move draws a pivot point and a symmetry
+            stats.count('pivot.attempts', nbPivots)
+            stats.count('pivot.rejections', nbPivots - accepted)
+            stats.count('pivot.draws', 2 * nbPivots)
+            stats.addTime('pivot', perf_counter() - start)
+        return accepted
+
+    def copy(self, startPoint, generator=None):
+        """Returns a copy of the walk, from another starting point and with another generator."""
+        walk = PivotWalk(startPoint, 0, generator)
+        walk.nbSteps = self.nbSteps
+        walk.points = list(self.points)
+        walk.occupied = dict(self.occupied)
+        return walk
+
+    def arrival(self):
+        """Returns the arrival point, relatively to the starting point."""
+        (x0, y0), (x1, y1), (xs, ys) = self.points[0], self.points[-1], self.startPoint
+        return (xs + x1 - x0, ys + y1 - y0)
+
+    def directions(self):
+        """Returns the directions of the steps of the walk."""
+        return [towards(p1, p2) for p1, p2 in zip(self.points, self.points[1:])]
+
+    def notify(self, model):
+        """Sends the steps of the walk to a model."""
+        for direction in self.directions():
+            notifyModel(model, direction)
+
+# ============================================== WALKS =============================================
+def pivotWalk(startPoint, nbSteps, model=None, generator=None, nbPivots=None):
+    """Generates a self avoiding walk with the pivot algorithm (nbPivots attempts from a rod)."""
+    if nbPivots is None:
+        walk = next(pivotChain(startPoint, nbSteps, generator))
+    else:
+        walk = PivotWalk(startPoint, nbSteps, generator)
+        walk.sample(nbPivots)
+    if model is not None:
+        walk.notify(model)
+    # Returns the arrival point
+    return walk.arrival()
+
+def pivotSamples(startPoint, nbSteps, nbWalks, generator=None, equilibration=None,\
+decorrelation=DEF_DECORRELATION):
+    """Samples the arrivals (unit weight) of self avoiding walks from a single pivot chain."""
+    return [(walk.arrival(), 1.0) for walk in islice(pivotChain(startPoint, nbSteps, generator,\
+    equilibration, decorrelation), nbWalks)]
+
+def pivotChain(startPoint, nbSteps, generator=None, equilibration=None,\
+decorrelation=DEF_DECORRELATION):
+    """Yields the walk of a pivot chain (the same PivotWalk, moved) every decorrelation attempts."""
+    walk = equilibratedWalk(startPoint, nbSteps, generator, equilibration)
+    # Chains started from the same equilibrated walk first move away from it
+    walk.sample(DEF_RESTART * decorrelation)
+    while True:
+        walk.sample(decorrelation)
+        yield walk
+
+def equilibratedWalk(startPoint, nbSteps, generator=None, equilibration=None):
+    """Returns a copy of an equilibrated walk, equilibrated from a rod once per process."""
+    if equilibration is None:
+        equilibration = DEF_EQUILIBRATION * nbSteps
+    key = (nbSteps, equilibration)
+    if key not in EQUILIBRATED:
+        # Equilibrated with its own seed, so that the walk does not depend on the process history
+        # (and the results do not depend on the number of workers)
+        state = getstate()
+        seed("pivot/{}/{}".format(nbSteps, equilibration))
+        walk = PivotWalk((0, 0), nbSteps)
+        walk.sample(equilibration)
+        setstate(state)
+        EQUILIBRATED[key] = walk
+    return EQUILIBRATED[key].copy(startPoint, generator)
+# ==================================================================================================
@@ -2,15 +2,21 @@
 
 from multiprocessing import Process, Queue
 
+import WalkStats
 from Walk import WalkType, randomWalk, nonReversingWalk, selfAvoidingWalk
+from PivotWalk import pivotWalk
+from WeightedWalk import rosenbluthWalk
 from OneTermGenerator import OneTermGenerator
 from TwoTermGenerator import TwoTermGenerator
-from WalkGUI import WalkGUI
+from BufferedGenerator import BufferedGenerator
+from DirectionSource import DirectionSource
+from Transport import ChunkedSender
 
 class RWLauncher(Process):
     """Random walk launcher."""
 
-    def __init__(self, startPoint, nbSteps, walkType, backtrack, guiQueue=None, generator=None):
+    def __init__(self, startPoint, nbSteps, walkType, backtrack, guiQueue=None, generator=None,\
+    stats=False):
         super(RWLauncher, self).__init__()
         self.startPoint = startPoint
         self.nbSteps = nbSteps
@@ -18,16 +24,30 @@ class RWLauncher(Process):
         self.backtrack = backtrack
         self.queue = guiQueue
         self.generator = generator
+        # Prints the statistics of the walk once it is done
+        self.stats = stats
 
     def run(self):
         """Runs the simulation."""
+        # The moves are sent to the GUI by chunks, not one by one
+        model = None if self.queue is None else ChunkedSender(self.queue)
+        if self.stats:
+            WalkStats.enable()
         if self.walkType == WalkType.RANDOM:
-            randomWalk(self.startPoint, self.nbSteps, self.queue, self.generator)
+            randomWalk(self.startPoint, self.nbSteps, model, self.generator)
         elif self.walkType == WalkType.NON_REVERSING:
-            nonReversingWalk(self.startPoint, self.nbSteps, self.queue, self.generator)
+            nonReversingWalk(self.startPoint, self.nbSteps, model, self.generator)
         elif self.walkType == WalkType.SELF_AVOIDING:
             selfAvoidingWalk(self.startPoint, self.nbSteps, self.backtrack,\
-            self.queue, self.generator)
+            model, self.generator)
+        elif self.walkType == WalkType.PIVOT:
+            pivotWalk(self.startPoint, self.nbSteps, model, self.generator)
+        elif self.walkType == WalkType.ROSENBLUTH:
+            rosenbluthWalk(self.startPoint, self.nbSteps, model, self.generator)
+        if model is not None:
+            model.close()
+        if self.stats:
+            print(WalkStats.disable().report())
 
     def getNbSteps(self):
         """Returns the simulation's number of steps."""
@@ -47,24 +67,34 @@ class RWLauncher(Process):
 
 # ========================================== LAUNCHER PART =========================================
 if __name__ == '__main__':
+    # Imported here, so that the simulation can be used without a display (Tkinter)
+    from WalkGUI import WalkGUI
     # ******************************** MODIFY ONLY THESE PARAMETERS ********************************
     # The number of steps of the walk.
     NBSTEPS = 100
     # The random generator used for the generation. Set to 'None' to use the native generator, else
-    # to 'OneTermGenerator()', or 'TwoTermGenerator()'.
+    # to 'OneTermGenerator()', or 'TwoTermGenerator()' (wrapped in 'BufferedGenerator()' to generate
+    # the numbers by blocks, or in 'DirectionSource()' to slice each number in many directions).
     GENERATOR = None
     # Set to True to use backtrack during a self-avoiding walk.
     # If set to False, the simulation will stop at the first collision.
     BACKTRACK = True
-    # The walk type : 'RANDOM', 'NON_REVERSING', or 'SELF_AVOIDING'.
+    # The walk type : 'RANDOM', 'NON_REVERSING', 'SELF_AVOIDING', 'PIVOT' (self-avoiding walk
+    # sampled with the pivot algorithm, for long walks : its cost grows as the square of NBSTEPS,
+    # about 20 s for 10^4 steps), or 'ROSENBLUTH' (self-avoiding walk grown among free neighbours).
     WALKTYPE = WalkType.RANDOM
+    # Set to True to render many steps per frame (for very long walks), instead of one step per
+    # refresh.
+    FASTRENDERING = False
+    # Set to True to print the statistics (attempts, backtracks, random draws, timings) of the walk
+    STATS = False
     # **********************************************************************************************
     STARTPOINT = (NBSTEPS/2, NBSTEPS/2)
     # Creates the random walk simulator
     QUEUE = Queue()
-    PROC = RWLauncher(STARTPOINT, NBSTEPS, WALKTYPE, BACKTRACK, QUEUE, GENERATOR)
+    PROC = RWLauncher(STARTPOINT, NBSTEPS, WALKTYPE, BACKTRACK, QUEUE, GENERATOR, STATS)
     # Creates the GUI
-    GUI = WalkGUI(PROC)
+    GUI = WalkGUI(PROC, FASTRENDERING)
     # Starts the random walk
     PROC.start()
     # Displays the GUI
@@ -0,0 +1,91 @@
+"""On-disk cache of the accumulators computed by the sweeps."""
+
+import os
+import json
+import hashlib
+
+DEF_CACHE_DIR = '.results_cache'
+# Default maximum size of the cache directory, in bytes
+DEF_MAX_SIZE = 64 * 1024 * 1024
+FILE_EXT = '.json'
+# Fraction of the maximum size the cache is brought back to, so that it is not scanned at each write
+EVICT_RATIO = 0.75
+
+class ResultCache(object):
+    """Accumulators stored as JSON files, evicting the least recently used ones."""
+
+    # Constructor
+    def __init__(self, directory=DEF_CACHE_DIR, maxSize=DEF_MAX_SIZE):
+        self.directory = directory
+        self.maxSize = maxSize
+        os.makedirs(directory, exist_ok=True)
+        # Total size of the entries, scanned on the first write then kept up to date
+        self.size = None
+
+    def path(self, key):
+        """Returns the path of the file of an entry."""
+        return os.path.join(self.directory, key + FILE_EXT)
+
+    def get(self, key):
+        """Returns the accumulators states of an entry, or None if it is not cached."""
+        try:
+            with open(self.path(key)) as entry:
+                states = json.load(entry)
+            # Marks the entry as recently used
+            os.utime(self.path(key))
+            return states
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, states):
+        """Stores the accumulators states of an entry."""
+        # Writes then renames, so an interrupted run never leaves a truncated entry
+        temp = self.path(key) + '.tmp'
+        with open(temp, 'w') as entry:
+            json.dump(states, entry)
+        if self.size is None:
+            self.size = sum(entry[1] for entry in self.entries())
+        # A replaced entry no longer counts
+        try:
+            self.size -= os.path.getsize(self.path(key))
+        except OSError:
+            pass
+        self.size += os.path.getsize(temp)
+        os.replace(temp, self.path(key))
+        # The directory is only scanned when the cache may be too large
+        if self.size > self.maxSize:
+            self.evict()
+
+    def entries(self):
+        """Returns the (last use, size, file name) of the entries."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(FILE_EXT):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is well under its maximum."""
+        entries = self.entries()
+        # Entries written by other processes are counted again
+        size = sum(entry[1] for entry in entries)
+        for _, entrySize, name in sorted(entries):
+            if size <= EVICT_RATIO * self.maxSize:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            size -= entrySize
+        self.size = size
+
+def cacheKey(walkType, checkpoints, nbWalks, generator=None, seed=None, **params):
+    """Builds the key of an entry, from everything its accumulators depend on."""
+    fields = {'walkType': walkType.name, 'checkpoints': list(checkpoints), 'nbWalks': nbWalks,\
+    'generator': None if generator is None else [type(generator).__name__, vars(generator)],\
+    'seed': seed, 'params': params}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=repr).encode()).hexdigest()
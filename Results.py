@@ -1,45 +1,345 @@
 """Verification of the article results."""
 
 from math import floor
-from Walk import randomWalk, nonReversingWalk, selfAvoidingWalk, distance
+from itertools import repeat
+from random import Random, seed as seedNative
+from concurrent.futures import ProcessPoolExecutor
+from numpy.random import default_rng
+
+import WalkStats
+from Walk import WalkType, randomWalk, nonReversingWalk, selfAvoidingWalk, distance
+from BatchWalk import batchWalk, batchCheckpoints, batchDistances
+from PivotWalk import pivotSamples
+from WeightedWalk import rosenbluthSamples, permSamples
+from Accumulator import Accumulator
+from ResultCache import ResultCache, cacheKey
+from Enumeration import enumerateWalks
+
+# Default number of walks computed by a task of a parallel sweep
+DEF_BATCH_SIZE = 50
+# Number of walks between two precision checks of a cell, when a tolerance is given, and of a block
+# of correlated walks
+DEF_CHECK_SIZE = 50
+# Number of tasks run for each unfinished cell between two precision checks of a parallel sweep
+DEF_WAVE_SIZE = 4
+
+# Walk functions, giving one walk at a time
+WALKS = {WalkType.RANDOM: randomWalk, WalkType.NON_REVERSING: nonReversingWalk,\
+WalkType.SELF_AVOIDING: selfAvoidingWalk}
+# Self-avoiding walk samplers, giving several weighted walks at once
+SAMPLERS = {WalkType.PIVOT: pivotSamples, WalkType.ROSENBLUTH: rosenbluthSamples,\
+WalkType.PERM: permSamples}
+# Samplers whose walks are correlated (one pivot chain, or the walks of a PERM tour) : their
+# confidence interval comes from the means of blocks of walks (batch means), and they never stop
+# early
+CORRELATED = (WalkType.PIVOT, WalkType.PERM)
 
 def averageDistance(nbSteps, nbWalks, func):
     """Computes the average distance of a walk."""
-    totalDistance = 0
+    return distanceAccumulator(nbSteps, nbWalks, func).ordinate()
+
+def distanceAccumulator(nbSteps, nbWalks, func, generator=None, acc=None):
+    """Accumulates the distances of several walks."""
+    if acc is None:
+        acc = Accumulator()
     startPoint = (0, 0)
     for _ in range(nbWalks):
         arrival = None
         while arrival is None:
-            arrival = func(startPoint, nbSteps)
-        totalDistance += distance(startPoint, arrival)
-    return pow(totalDistance/nbWalks, 2)
+            arrival = func(startPoint, nbSteps, generator=generator)
+        acc.add(distance(startPoint, arrival))
+    return acc
+
+def sampledAccumulator(nbSteps, nbWalks, sampler, generator=None, acc=None, block=False):
+    """Accumulates the weighted distances of walks from a sampler of (arrival, weight)."""
+    if acc is None:
+        acc = Accumulator()
+    startPoint = (0, 0)
+    # Correlated walks are added as a block, their confidence interval coming from the blocks
+    target = Accumulator() if block else acc
+    for arrival, weight in sampler(startPoint, nbSteps, nbWalks, generator):
+        # Trapped walks have a null weight, and no arrival
+        target.add(distance(startPoint, arrival) if weight > 0 else 0, weight)
+    if block:
+        acc.addBlock(target)
+    return acc
+
+def batchAccumulator(nbSteps, nbWalks, walkType, rng=None, acc=None):
+    """Accumulates the distances of several walks simulated all at once."""
+    if acc is None:
+        acc = Accumulator()
+    startPoint = (0, 0)
+    arrivals = batchWalk(walkType, startPoint, nbSteps, nbWalks, rng=rng)
+    acc.addBatch(batchDistances(startPoint, arrivals))
+    return acc
+
+def prefixAccumulators(checkpoints, nbWalks, walkType, rng=None, accs=None):
+    """Accumulates the distances of walks simulated once, at each checkpoint (number of steps)."""
+    if accs is None:
+        accs = [Accumulator() for _ in checkpoints]
+    startPoint = (0, 0)
+    points = batchCheckpoints(walkType, startPoint, checkpoints, nbWalks, rng)
+    for i, acc in enumerate(accs):
+        acc.addBatch(batchDistances(startPoint, points[:, i]))
+    return accs
+
+def checkpointAccumulators(walkType, checkpoints, nbWalks, batch=False, generator=None, rng=None,\
+tolerance=None):
+    """Accumulates the distances of the walks at each checkpoint, stopping once precise enough."""
+    accs = [Accumulator() for _ in checkpoints]
+    if walkType in CORRELATED:
+        tolerance = None
+    chunkSize = nbWalks if tolerance is None and walkType not in CORRELATED else DEF_CHECK_SIZE
+    done = 0
+    while done < nbWalks:
+        chunk = min(chunkSize, nbWalks - done)
+        # Prefix mode : one walk of the maximum length gives every shorter walk
+        if len(checkpoints) > 1:
+            prefixAccumulators(checkpoints, chunk, walkType, rng, accs)
+        elif batch and walkType in (WalkType.RANDOM, WalkType.NON_REVERSING):
+            batchAccumulator(checkpoints[0], chunk, walkType, rng, accs[0])
+        elif walkType in SAMPLERS:
+            sampledAccumulator(checkpoints[0], chunk, SAMPLERS[walkType], generator, accs[0],\
+            walkType in CORRELATED)
+        else:
+            distanceAccumulator(checkpoints[0], chunk, WALKS[walkType], generator, accs[0])
+        done += chunk
+        if tolerance is not None and all(acc.precise(tolerance) for acc in accs):
+            break
+    return accs
+
+def cachedAccumulators(cache, walkType, checkpoints, nbWalks, batch=False, tolerance=None,\
+seed=None):
+    """Accumulates the distances of the walks at each checkpoint, reusing cached results."""
+    # Unseeded cells can not be reproduced, so they are not cached
+    key = None if cache is None or seed is None else\
+    cacheKey(walkType, checkpoints, nbWalks, None, seed, batch=batch, tolerance=tolerance)
+    states = None if key is None else cache.get(key)
+    if states is not None:
+        return loadAccumulators(states)
+    # A seeded cell is seeded as the first task of the cell in a parallel sweep
+    rng = None if seed is None else seededRng(cellSeed(seed, walkType, checkpoints))
+    accs = checkpointAccumulators(walkType, checkpoints, nbWalks, batch, rng=rng,\
+    tolerance=tolerance)
+    if key is not None:
+        cache.put(key, [acc.getState() for acc in accs])
+    return accs
+
+def loadAccumulators(states):
+    """Builds accumulators from their states."""
+    accs = [Accumulator() for _ in states]
+    for acc, state in zip(accs, states):
+        acc.setState(state)
+    return accs
 
 def buildAbs(maxVal):
     """Build the abscissa values."""
     return [5*i for i in range(floor(maxVal/5)+1)]
 
-def buildOrd(abscissaTab, nbWalks):
+def buildOrd(abscissaTab, nbWalks, batch=False, sawType=WalkType.SELF_AVOIDING, nbWorkers=None,\
+prefix=False, tolerance=None, cache=None, seed=0):
     """Computes all the ordinates values."""
-    random = []
-    nonReversing = []
-    selfAvoiding = []
-    for ab in abscissaTab:
-        print("# Computing for ab = ", ab)
+    return tuple([acc.ordinate() for acc in accs] for accs in\
+    buildAcc(abscissaTab, nbWalks, batch, sawType, nbWorkers, prefix, tolerance, cache, seed))
+
+def buildAcc(abscissaTab, nbWalks, batch=False, sawType=WalkType.SELF_AVOIDING, nbWorkers=None,\
+prefix=False, tolerance=None, cache=None, seed=0):
+    """Computes the accumulators of all the ordinates values."""
+    if nbWorkers is not None:
+        return parallelBuildAcc(abscissaTab, nbWalks, nbWorkers, batch, sawType, prefix, tolerance,\
+        seed=seed, cache=cache)
+    cells = {(walkType, ab): acc for walkType, ab, acc in\
+    sweepCells(abscissaTab, nbWalks, batch, sawType, prefix, tolerance, cache, seed)}
+    return tuple([cells[(walkType, ab)] for ab in abscissaTab] for walkType in\
+    (WalkType.RANDOM, WalkType.NON_REVERSING, sawType))
+
+def sweepCells(abscissaTab, nbWalks, batch=False, sawType=WalkType.SELF_AVOIDING, prefix=False,\
+tolerance=None, cache=None, seed=None):
+    """Computes the accumulators of the sweep one by one, as (walk type, ab, accumulator)."""
+    if prefix:
+        print("# Computing for all ab at once")
         print(" -> Random...")
-        random.append(averageDistance(ab, nbWalks, randomWalk))
+        yield from zip(repeat(WalkType.RANDOM), abscissaTab, cachedAccumulators(cache,\
+        WalkType.RANDOM, tuple(abscissaTab), nbWalks, tolerance=tolerance, seed=seed))
         print(" -> Non reversing...")
-        nonReversing.append(averageDistance(ab, nbWalks, nonReversingWalk))
+        yield from zip(repeat(WalkType.NON_REVERSING), abscissaTab, cachedAccumulators(cache,\
+        WalkType.NON_REVERSING, tuple(abscissaTab), nbWalks, tolerance=tolerance, seed=seed))
+    for ab in abscissaTab:
+        print("# Computing for ab = ", ab)
+        if not prefix:
+            print(" -> Random...")
+            yield WalkType.RANDOM, ab, cachedAccumulators(cache, WalkType.RANDOM, (ab,), nbWalks,\
+            batch, tolerance, seed)[0]
+            print(" -> Non reversing...")
+            yield WalkType.NON_REVERSING, ab, cachedAccumulators(cache, WalkType.NON_REVERSING,\
+            (ab,), nbWalks, batch, tolerance, seed)[0]
         print(" -> Self-avoiding...")
-        selfAvoiding.append(averageDistance(ab, nbWalks, selfAvoidingWalk))
-    return random, nonReversing, selfAvoiding
+        yield sawType, ab, cachedAccumulators(cache, sawType, (ab,), nbWalks, batch, tolerance,\
+        seed)[0]
+
+# ========================================= PARALLEL SWEEP =========================================
+def buildTasks(abscissaTab, nbWalks, walkTypes, batchSize, batch=False, seed=0, generator=None,\
+prefix=False, stats=False):
+    """Splits the sweep grid (abscissa x walk type x walk batch) in deterministic tasks."""
+    tasks = []
+    for walkType in walkTypes:
+        # In prefix mode, a random or non reversing task covers all the abscissa values at once
+        if prefix and walkType in (WalkType.RANDOM, WalkType.NON_REVERSING):
+            checkpointsTab = [tuple(abscissaTab)]
+        else:
+            checkpointsTab = [(ab,) for ab in abscissaTab]
+        for checkpoints in checkpointsTab:
+            for first in range(0, nbWalks, batchSize):
+                # Each task has its own seed, whatever the worker running it
+                tasks.append([walkType, checkpoints, min(batchSize, nbWalks - first), batch, None,\
+                cellSeed(seed, walkType, checkpoints, first), stats])
+    # Custom generators are split in non-overlapping substreams, one per task
+    if generator is not None:
+        for task, stream in zip(tasks, generator.split(len(tasks))):
+            task[4] = stream
+    return tasks
+
+def cellSeed(seed, walkType, checkpoints, first=0):
+    """Returns the seed of the walks of a cell (walk type and checkpoints), from a given walk."""
+    return "{}/{}/{}/{}".format(seed, walkType.name, "-".join(str(ab) for ab in checkpoints), first)
+
+def seededRng(taskSeed):
+    """Seeds the native generator with a task seed, returns a NumPy generator seeded from it."""
+    seedNative(taskSeed)
+    return default_rng(Random(taskSeed).getrandbits(64))
+
+def taskKey(task):
+    """Builds the cache key of a task."""
+    walkType, checkpoints, nbWalks, batch, generator, taskSeed, _ = task
+    return cacheKey(walkType, checkpoints, nbWalks, generator, taskSeed, batch=batch)
+
+def runTask(task):
+    """Computes the accumulators of a task of the sweep, and its walk statistics (if asked)."""
+    walkType, checkpoints, nbWalks, batch, generator, taskSeed, stats = task
+    rng = seededRng(taskSeed)
+    # Each task records its own statistics, merged by the main process
+    if stats:
+        WalkStats.enable()
+    else:
+        WalkStats.disable()
+    accs = checkpointAccumulators(walkType, checkpoints, nbWalks, batch, generator, rng)
+    return accs, WalkStats.disable()
+
+def parallelBuildOrd(abscissaTab, nbWalks, nbWorkers, batch=False,\
+sawType=WalkType.SELF_AVOIDING, prefix=False, tolerance=None, batchSize=DEF_BATCH_SIZE, seed=0,\
+generator=None, cache=None):
+    """Computes all the ordinates values on a pool of processes."""
+    return tuple([acc.ordinate() for acc in accs] for accs in parallelBuildAcc(abscissaTab,\
+    nbWalks, nbWorkers, batch, sawType, prefix, tolerance, batchSize, seed, generator, cache))
+
+def parallelBuildAcc(abscissaTab, nbWalks, nbWorkers, batch=False,\
+sawType=WalkType.SELF_AVOIDING, prefix=False, tolerance=None, batchSize=DEF_BATCH_SIZE, seed=0,\
+generator=None, cache=None):
+    """Computes the accumulators of all the ordinates values on a pool of processes."""
+    walkTypes = (WalkType.RANDOM, WalkType.NON_REVERSING, sawType)
+    stats = WalkStats.ACTIVE
+    tasks = buildTasks(abscissaTab, nbWalks, walkTypes, batchSize, batch, seed, generator, prefix,\
+    stats is not None)
+    print("# Computing", len(tasks), "tasks on", nbWorkers, "workers")
+    # Pending tasks of each group of cells (walk type and checkpoints), in order
+    groups = {}
+    for task in tasks:
+        groups.setdefault((task[0], task[1]), []).append(task)
+    cells = {(walkType, ab): Accumulator() for walkType in walkTypes for ab in abscissaTab}
+    with ProcessPoolExecutor(nbWorkers) as pool:
+        while groups:
+            # Without tolerance, all the tasks are run at once. Else, a fixed wave of tasks of each
+            # unfinished group is run before checking the precision again.
+            wave = []
+            for (walkType, _), pending in groups.items():
+                size = len(pending) if tolerance is None or walkType in CORRELATED\
+                else DEF_WAVE_SIZE
+                wave += pending[:size]
+                del pending[:size]
+            # Tasks already computed by a previous (maybe interrupted) run are read from the cache
+            cached = [None] * len(wave)
+            if cache is not None:
+                cached = [cache.get(taskKey(task)) for task in wave]
+            computed = pool.map(runTask, [task for task, states in zip(wave, cached)\
+            if states is None])
+            # Accumulators are merged in the tasks order, so the result does not depend on the
+            # number of workers
+            for task, states in zip(wave, cached):
+                if states is None:
+                    accs, taskStats = next(computed)
+                    if taskStats is not None:
+                        stats.merge(taskStats)
+                    if cache is not None:
+                        cache.put(taskKey(task), [acc.getState() for acc in accs])
+                else:
+                    accs = loadAccumulators(states)
+                for ab, acc in zip(task[1], accs):
+                    cells[(task[0], ab)].merge(acc)
+            groups = {group: pending for group, pending in groups.items()\
+            if pending and not groupPrecise(cells, group, tolerance)}
+    return tuple([cells[(walkType, ab)] for ab in abscissaTab] for walkType in walkTypes)
+
+def groupPrecise(cells, group, tolerance):
+    """Checks if all the cells of a group are precise enough (never without tolerance)."""
+    walkType, checkpoints = group
+    return tolerance is not None and walkType not in CORRELATED and\
+    all(cells[(walkType, ab)].precise(tolerance) for ab in checkpoints)
+
+# ========================================= EXACT REFERENCE ========================================
+def compareExact(abscissaTab, accs, rows):
+    """Compares the self-avoiding walks estimates with the exact values of an enumeration."""
+    print("# Comparison with the exact enumeration")
+    for ab, acc in zip(abscissaTab, accs):
+        if ab < len(rows):
+            _, count, meanSquare, meanDistance = rows[ab]
+            # Deviation of the estimate, in half widths of its confidence interval
+            halfWidth = acc.ordinateHalfWidth()
+            deviation = (acc.ordinate() - pow(meanDistance, 2)) / halfWidth if halfWidth > 0 else 0
+            print(" -> ab =", ab, ": c =", count, ", exact", pow(meanDistance, 2), ", estimate",\
+            acc.ordinate(), "(" + format(deviation, '+.2f'), "half widths ), exact <R^2>",\
+            meanSquare, ", estimate", acc.meanSq)
 
 # ********************************** MODIFY ONLY THESE PARAMETERS **********************************
 # The maximum number of steps for a walk
 MAXSTEP = 100
 # The number of walks used to get an average
 NBWALKS = 500
+# Set to True to simulate the random and non reversing walks all at once, with NumPy
+BATCH = True
+# The self-avoiding walk generation : 'SELF_AVOIDING' (rejection), 'PIVOT' (pivot algorithm),
+# 'ROSENBLUTH' (weighted growth), or 'PERM' (pruned-enriched weighted growth, one walk is one tour)
+SAWTYPE = WalkType.SELF_AVOIDING
+# The number of worker processes. Set to 'None' to compute everything in this process, else the
+# results are reproducible whatever the number of workers.
+NBWORKERS = None
+# Set to True to simulate each random and non reversing walk once, with MAXSTEP steps, and to use
+# its prefixes for all the smaller numbers of steps (NumPy)
+PREFIX = True
+# The relative precision (half width of the 95% confidence interval of the average distance) at
+# which a cell stops, NBWALKS being then the maximum number of walks. Set to 'None' to always
+# compute NBWALKS walks. The PIVOT and PERM cells always compute NBWALKS walks.
+TOLERANCE = None
+# The directory where computed cells are kept, to be reused by the next runs (and to resume an
+# interrupted parallel sweep). Set to 'None' to disable the cache.
+CACHEDIR = None
+# The maximum number of steps of the self-avoiding walks enumerated exactly, to check the estimates
+# against (a few minutes up to about 20 steps). Set to 'None' to disable the comparison.
+EXACTSTEPS = None
+# Set to True to count the attempts, rejections, backtracks and random draws of the walks, and to
+# time them (reported at the end)
+STATS = False
 # **************************************************************************************************
-RANDOM, NONREVERSING, SELFAVOIDING = buildOrd(buildAbs(MAXSTEP), NBWALKS)
-print(RANDOM)
-print(NONREVERSING)
-print(SELFAVOIDING)
+if __name__ == '__main__':
+    CACHE = None if CACHEDIR is None else ResultCache(CACHEDIR)
+    if STATS:
+        WalkStats.enable()
+    ACCUMULATORS = buildAcc(buildAbs(MAXSTEP), NBWALKS, BATCH, SAWTYPE, NBWORKERS, PREFIX,\
+    TOLERANCE, CACHE)
+    for ACCS in ACCUMULATORS:
+        print([acc.ordinate() for acc in ACCS])
+        print(" +/-", [acc.ordinateHalfWidth() for acc in ACCS])
+    if EXACTSTEPS is not None:
+        compareExact(buildAbs(MAXSTEP), ACCUMULATORS[2],\
+        enumerateWalks(min(EXACTSTEPS, MAXSTEP), NBWORKERS))
+    if STATS:
+        print(WalkStats.ACTIVE.report())
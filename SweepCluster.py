@@ -0,0 +1,358 @@
+"""Sweep of Results split in shards, computed by workers connected over TCP to a coordinator."""
+
+import os
+import sys
+import socket
+import argparse
+import threading
+import contextlib
+from time import sleep
+from multiprocessing import Process, AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import WalkStats
+from Walk import WalkType
+from Accumulator import Accumulator
+from Results import DEF_BATCH_SIZE, buildAbs, buildTasks, taskKey, runTask, loadAccumulators
+
+# Default number of seconds given to a worker to compute a shard, before it is given to another one
+DEF_TIMEOUT = 600
+# Default number of times a shard can fail or time out before the sweep is aborted
+DEF_MAX_ATTEMPTS = 3
+# Default number of attempts of a worker to connect, and seconds between two attempts
+DEF_CONNECT_ATTEMPTS = 20
+DEF_CONNECT_DELAY = 0.5
+# Seconds between two checks of the local workers, by the coordinator
+DEF_POLL_DELAY = 1
+# Environment variable holding the key authenticating the workers
+AUTHKEY_VAR = 'SWEEP_AUTHKEY'
+
+# ========================================== COORDINATOR ===========================================
+class Coordinator(object):
+    """Hands the shards of a sweep out to the connected workers, and merges their accumulators."""
+
+    # Constructor
+    def __init__(self, tasks, address, authkey, timeout=DEF_TIMEOUT,\
+    maxAttempts=DEF_MAX_ATTEMPTS, cache=None):
+        self.tasks = tasks
+        self.timeout = timeout
+        self.maxAttempts = maxAttempts
+        self.cache = cache
+        self.listener = Listener(address, authkey=authkey)
+        self.authkey = authkey
+        self.condition = threading.Condition()
+        # Shards not handed out yet, and number of failures of each shard
+        self.pending = list(range(len(tasks)))
+        self.failures = [0] * len(tasks)
+        # Accumulators received and not merged yet, index of the next shard to merge
+        self.received = {}
+        self.nextMerge = 0
+        self.cells = {}
+        self.error = None
+        self.stats = WalkStats.ACTIVE
+        self.closed = False
+        self.acceptor = threading.Thread(target=self.accept, daemon=True)
+        # Shards already computed by a previous (maybe interrupted) run are read from the cache
+        if cache is not None:
+            for index, task in enumerate(tasks):
+                states = cache.get(taskKey(task))
+                if states is not None:
+                    self.received[index] = loadAccumulators(states)
+                    self.pending.remove(index)
+            self.merge()
+
+    @property
+    def address(self):
+        """Returns the address the workers connect to."""
+        return self.listener.address
+
+    def done(self):
+        """Checks if all the shards have been merged."""
+        return self.nextMerge == len(self.tasks)
+
+    def run(self, alive=None):
+        """Serves the workers until all the shards are merged, returns the merged cells."""
+        print("# Serving", len(self.pending), "shards on", self.address)
+        self.acceptor.start()
+        with self.condition:
+            while not self.done() and self.error is None:
+                self.condition.wait(None if alive is None else DEF_POLL_DELAY)
+                # Known workers (alive function given) all stopped : nobody is left for the shards
+                if alive is not None and not self.done() and not alive():
+                    self.error = "no worker left, {} shards not merged".format(\
+                    len(self.tasks) - self.nextMerge)
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return self.cells
+
+    def close(self):
+        """Stops accepting workers."""
+        self.closed = True
+        # Wakes the acceptor up with a last connection, so that it stops
+        if self.acceptor.is_alive():
+            try:
+                Client(self.address, authkey=self.authkey).close()
+            except OSError:
+                pass
+            self.acceptor.join()
+        self.listener.close()
+
+    def accept(self):
+        """Accepts the workers, each one being served by its own thread."""
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except (OSError, AuthenticationError):
+                # Failed authentication, or closed listener
+                continue
+            with self.condition:
+                finished = self.done() or self.error is not None
+            # Workers connecting once the sweep is over are sent away
+            if finished or self.closed:
+                conn.close()
+            else:
+                threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        """Sends shards to a worker one at a time, until there are no more."""
+        index = None
+        try:
+            name = conn.recv()
+            while True:
+                index = self.nextShard()
+                if index is None:
+                    conn.send(('stop',))
+                    return
+                conn.send(('shard', index, self.tasks[index]))
+                # A worker too slow or lost gives its shard back
+                if not conn.poll(self.timeout):
+                    print("# Shard", index, "timed out on", name)
+                    return
+                reply = conn.recv()
+                if reply[0] == 'result':
+                    self.complete(index, reply[2], reply[3])
+                else:
+                    print("# Shard", index, "failed on", name, ":", reply[2])
+                    self.requeue(index)
+                index = None
+        except (EOFError, OSError):
+            pass
+        finally:
+            if index is not None:
+                self.requeue(index)
+            conn.close()
+
+    def nextShard(self):
+        """Returns the index of the next shard to compute (waiting for one), or None at the end."""
+        with self.condition:
+            while not self.pending and not self.done() and self.error is None:
+                # Shards of other workers can still be given back
+                self.condition.wait()
+            if not self.pending or self.error is not None:
+                return None
+            return self.pending.pop(0)
+
+    def requeue(self, index):
+        """Gives a failed or timed out shard to the next worker asking for one."""
+        with self.condition:
+            if index in self.received or index < self.nextMerge:
+                return
+            self.failures[index] += 1
+            if self.failures[index] >= self.maxAttempts:
+                self.error = "shard {} failed {} times".format(index, self.failures[index])
+            elif index not in self.pending:
+                self.pending.insert(0, index)
+            self.condition.notify_all()
+
+    def complete(self, index, states, statsState):
+        """Receives the accumulators of a shard, and merges all the shards received in order."""
+        with self.condition:
+            # A shard given back after a timeout can be computed twice
+            if index in self.received or index < self.nextMerge:
+                return
+            self.received[index] = loadAccumulators(states)
+            if index in self.pending:
+                self.pending.remove(index)
+            if statsState is not None and self.stats is not None:
+                taskStats = WalkStats.WalkStats()
+                taskStats.setState(statsState)
+                self.stats.merge(taskStats)
+            if self.cache is not None:
+                self.cache.put(taskKey(self.tasks[index]), states)
+            self.merge()
+            self.condition.notify_all()
+
+    def merge(self):
+        """Merges the received shards following the last merged one."""
+        # Merged in the shards order, so the result does not depend on the workers
+        merged = self.nextMerge
+        while self.nextMerge in self.received:
+            task = self.tasks[self.nextMerge]
+            for ab, acc in zip(task[1], self.received.pop(self.nextMerge)):
+                self.cells.setdefault((task[0], ab), Accumulator()).merge(acc)
+            self.nextMerge += 1
+        if self.nextMerge > merged:
+            print("# Merged", self.nextMerge, "/", len(self.tasks), "shards")
+
+def clusterBuildAcc(abscissaTab, nbWalks, address, authkey, batch=False,\
+sawType=WalkType.SELF_AVOIDING, prefix=False, batchSize=DEF_BATCH_SIZE, seed=0, generator=None,\
+cache=None, timeout=DEF_TIMEOUT, nbLocalWorkers=0):
+    """Computes the accumulators of all the ordinates values on the workers connecting."""
+    walkTypes = (WalkType.RANDOM, WalkType.NON_REVERSING, sawType)
+    tasks = buildTasks(abscissaTab, nbWalks, walkTypes, batchSize, batch, seed, generator, prefix,\
+    WalkStats.ACTIVE is not None)
+    coordinator = Coordinator(tasks, address, authkey, timeout, cache=cache)
+    # Local workers are started once the coordinator listens (its port can be chosen by the system)
+    workers = [Process(target=runWorker, args=(coordinator.address, authkey, "local-" + str(i)))\
+    for i in range(nbLocalWorkers)]
+    for worker in workers:
+        worker.start()
+    try:
+        cells = coordinator.run(lambda: any(worker.is_alive() for worker in workers)\
+        if workers else None)
+    finally:
+        # Forked workers share the listening socket : it is closed once they have all stopped
+        for worker in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        coordinator.close()
+    return tuple([cells.get((walkType, ab), Accumulator()) for ab in abscissaTab]\
+    for walkType in walkTypes)
+
+# ============================================= WORKER =============================================
+def runWorker(address, authkey, name=None, attempts=DEF_CONNECT_ATTEMPTS):
+    """Computes the shards sent by a coordinator until it stops, returns their number."""
+    if name is None:
+        name = "{}:{}".format(socket.gethostname(), os.getpid())
+    done = 0
+    while True:
+        try:
+            conn = connect(address, authkey, attempts)
+        except OSError:
+            # The coordinator has stopped
+            return done
+        with conn:
+            received, computed, stopped = computeShards(conn, name)
+        done += computed
+        # A dropped connection (shard timed out) is opened again, unless it was closed before
+        # giving any shard : the coordinator sends the workers away once the sweep is over
+        if stopped or received == 0:
+            return done
+
+def computeShards(conn, name):
+    """Computes the shards sent on a connection, returns (received, computed, stopped) counts."""
+    received = 0
+    computed = 0
+    try:
+        conn.send(name)
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                return received, computed, True
+            received += 1
+            _, index, task = message
+            try:
+                accs, taskStats = runTask(task)
+                reply = ('result', index, [acc.getState() for acc in accs],\
+                None if taskStats is None else taskStats.getState())
+                computed += 1
+            except Exception as exc:
+                reply = ('error', index, repr(exc))
+            conn.send(reply)
+    except (EOFError, OSError):
+        # The coordinator gave the shard to another worker (timeout), or has stopped
+        return received, computed, False
+
+def connect(address, authkey, attempts=DEF_CONNECT_ATTEMPTS):
+    """Connects to a coordinator, retrying while it is not started yet."""
+    for attempt in range(attempts):
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if attempt == attempts - 1:
+                raise
+            sleep(DEF_CONNECT_DELAY)
+
+def localBuildAcc(abscissaTab, nbWalks, nbWorkers, batch=False, sawType=WalkType.SELF_AVOIDING,\
+prefix=False, batchSize=DEF_BATCH_SIZE, seed=0, generator=None, cache=None, timeout=DEF_TIMEOUT):
+    """Runs a sweep on nbWorkers worker processes connecting to a coordinator on localhost."""
+    # Port 0 : any free port
+    return clusterBuildAcc(abscissaTab, nbWalks, ('localhost', 0), os.urandom(16), batch, sawType,\
+    prefix, batchSize, seed, generator, cache, timeout, nbWorkers)
+
+# ========================================== COMMAND LINE ==========================================
+def parseAddress(text):
+    """Parses a 'host:port' address."""
+    host, _, port = text.rpartition(':')
+    return (host or 'localhost', int(port))
+
+def parseArguments(argv=None):
+    """Parses the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, epilog="The workers are authenticated "\
+    "by a key shared with the coordinator, read from the " + AUTHKEY_VAR + " variable.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    coordinate = commands.add_parser('coordinate', help="split a sweep and serve its shards")
+    coordinate.add_argument('address', help="host:port to listen on")
+    coordinate.add_argument('maxStep', type=int)
+    coordinate.add_argument('-n', '--walks', type=int, default=500, help="walks per cell")
+    coordinate.add_argument('--saw-type', choices=['SELF_AVOIDING', 'PIVOT', 'ROSENBLUTH',\
+    'PERM'], default='SELF_AVOIDING')
+    coordinate.add_argument('--batch', action='store_true', help="simulate with NumPy")
+    coordinate.add_argument('--prefix', action='store_true',\
+    help="use the prefixes of walks (NumPy)")
+    coordinate.add_argument('--shard-size', type=int, default=DEF_BATCH_SIZE,\
+    help="walks per shard")
+    coordinate.add_argument('--seed', type=int, default=0)
+    coordinate.add_argument('--timeout', type=float, default=DEF_TIMEOUT,\
+    help="seconds given to a worker for a shard")
+    coordinate.add_argument('--cache', help="directory of the result cache")
+    coordinate.add_argument('--stats', action='store_true',\
+    help="print the walk statistics on the standard error")
+    coordinate.add_argument('-o', '--output', default='-',\
+    help="CSV file, NPZ file (.npz extension), or '-' for the standard output (default)")
+    work = commands.add_parser('work', help="compute the shards of a coordinator")
+    work.add_argument('address', help="host:port of the coordinator")
+    work.add_argument('--processes', type=int, default=1, help="number of worker processes")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Runs the command line."""
+    args = parseArguments(argv)
+    if AUTHKEY_VAR not in os.environ:
+        raise SystemExit("the " + AUTHKEY_VAR + " variable must hold the shared key")
+    authkey = os.environ[AUTHKEY_VAR].encode()
+    address = parseAddress(args.address)
+    if args.command == 'work':
+        workers = [Process(target=runWorker, args=(address, authkey))\
+        for _ in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return
+    # Imported here, the outputs being only needed by the coordinator
+    from BatchRunner import openWriter, cellRows, CELL_COLUMNS
+    from ResultCache import ResultCache
+    if args.stats:
+        WalkStats.enable()
+    abscissaTab = buildAbs(args.maxStep)
+    sawType = WalkType[args.saw_type]
+    cache = None if args.cache is None else ResultCache(args.cache)
+    # The progress messages go to the standard error, the results being on the standard output
+    with contextlib.redirect_stdout(sys.stderr):
+        accs = clusterBuildAcc(abscissaTab, args.walks, address, authkey, args.batch, sawType,\
+        args.prefix, args.shard_size, args.seed, cache=cache, timeout=args.timeout)
+    writer = openWriter(args.output, CELL_COLUMNS)
+    try:
+        for row in cellRows((walkType, ab, acc) for walkType, walkAccs in\
+        zip((WalkType.RANDOM, WalkType.NON_REVERSING, sawType), accs)\
+        for ab, acc in zip(abscissaTab, walkAccs)):
+            writer.write(row)
+    finally:
+        writer.close()
+    if args.stats:
+        print(WalkStats.ACTIVE.report(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Compact walk trajectory, stored as 2-bit direction codes."""
+
+import struct
+
+from Walk import Direction
+
+# Binary format : magic, version, starting point, number of steps, then the packed codes
+MAGIC = b'WTRJ'
+VERSION = 1
+HEADER = struct.Struct('<4sBqqQ')
+
+# Direction of each code, and its step vector
+DIRECTIONS = [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]
+STEPS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+class Trajectory(object):
+    """Walk stored as 2-bit direction codes, 4 steps per byte."""
+
+    # Constructor
+    def __init__(self, startPoint=(0, 0)):
+        self.startPoint = (int(startPoint[0]), int(startPoint[1]))
+        self.endPoint = self.startPoint
+        self.data = bytearray()
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, direction):
+        """Adds a step in a given direction."""
+        self.appendCode(direction.value - 1)
+
+    def appendCode(self, code):
+        """Adds a step, given its direction code."""
+        shift = 2 * (self.length & 3)
+        if shift == 0:
+            self.data.append(code)
+        else:
+            self.data[-1] |= code << shift
+        self.length += 1
+        dx, dy = STEPS[code]
+        self.endPoint = (self.endPoint[0] + dx, self.endPoint[1] + dy)
+
+    def pop(self):
+        """Removes the last step, returns its direction."""
+        if self.length == 0:
+            raise IndexError("pop from an empty trajectory")
+        self.length -= 1
+        shift = 2 * (self.length & 3)
+        code = (self.data[-1] >> shift) & 3
+        if shift == 0:
+            self.data.pop()
+        else:
+            self.data[-1] &= ~(3 << shift) & 0xff
+        dx, dy = STEPS[code]
+        self.endPoint = (self.endPoint[0] - dx, self.endPoint[1] - dy)
+        return DIRECTIONS[code]
+
+    def code(self, i):
+        """Returns the direction code of the i-th step."""
+        if not 0 <= i < self.length:
+            raise IndexError("trajectory index out of range")
+        return (self.data[i >> 2] >> (2 * (i & 3))) & 3
+
+    def codes(self):
+        """Iterates over the direction codes of the steps."""
+        remaining = self.length
+        for byte in self.data:
+            for shift in range(0, 2 * min(4, remaining), 2):
+                yield (byte >> shift) & 3
+            remaining -= 4
+
+    def directions(self):
+        """Iterates over the directions of the steps."""
+        for code in self.codes():
+            yield DIRECTIONS[code]
+
+    def points(self):
+        """Iterates over the points of the walk, decoded on the fly."""
+        x, y = self.startPoint
+        yield (x, y)
+        for code in self.codes():
+            dx, dy = STEPS[code]
+            x += dx
+            y += dy
+            yield (x, y)
+
+    def put(self, command):
+        """Records a (direction, mode) command, so that the trajectory can be a walk's model."""
+        direction, mode = command
+        # When backtracking, the direction is the one going back to the previous point
+        if mode == 'b':
+            self.pop()
+        else:
+            self.append(direction)
+
+    def toBytes(self):
+        """Serializes the trajectory."""
+        return HEADER.pack(MAGIC, VERSION, self.startPoint[0], self.startPoint[1], self.length)\
+        + bytes(self.data)
+
+    def save(self, path):
+        """Writes the trajectory in a file."""
+        with open(path, 'wb') as output:
+            output.write(self.toBytes())
+
+def fromBytes(data):
+    """Deserializes a trajectory."""
+    magic, version, x, y, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a trajectory, or unsupported version")
+    trajectory = Trajectory((x, y))
+    trajectory.data = bytearray(data[HEADER.size:HEADER.size + (length + 3) // 4])
+    trajectory.length = length
+    # Decodes the steps once to restore the end point
+    for point in trajectory.points():
+        trajectory.endPoint = point
+    return trajectory
+
+def load(path):
+    """Reads a trajectory from a file."""
+    with open(path, 'rb') as source:
+        return fromBytes(source.read())
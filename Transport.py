@@ -0,0 +1,77 @@
+"""Batched transport of the moves of a walk, from the simulation process to the GUI."""
+
+import queue
+
+from Trajectory import DIRECTIONS
+
+# Default number of moves sent in a single message
+DEF_CHUNK_SIZE = 4096
+# A move is a direction code (0-3), plus this flag when the walk is backtracking
+BACK_FLAG = 4
+
+class ChunkedSender(object):
+    """Model of a walk, sending its moves to a queue by chunks of one byte codes."""
+
+    # Constructor
+    def __init__(self, outQueue, chunkSize=DEF_CHUNK_SIZE):
+        self.queue = outQueue
+        self.chunkSize = chunkSize
+        self.buffer = bytearray()
+
+    def put(self, command):
+        """Records a (direction, mode) command, sending the chunk once it is full."""
+        direction, mode = command
+        self.buffer.append(direction.value - 1 | (BACK_FLAG if mode == 'b' else 0))
+        if len(self.buffer) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """Sends the pending moves."""
+        if self.buffer:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        """Sends the pending moves, then the end of the walk."""
+        self.flush()
+        self.queue.put(None)
+
+class ChunkedReceiver(object):
+    """Drains the chunks sent to a queue, and gives back the commands."""
+
+    # Constructor
+    def __init__(self, inQueue):
+        self.queue = inQueue
+        self.pending = bytearray()
+        self.index = 0
+        self.finished = False
+
+    def drain(self):
+        """Gets every chunk available in the queue, returns the number of pending moves."""
+        while not self.finished:
+            try:
+                chunk = self.queue.get(False)
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.finished = True
+            else:
+                self.pending += chunk
+        return len(self.pending) - self.index
+
+    def commands(self, maxCount=None):
+        """Returns (at most maxCount) pending commands, as (direction, mode)."""
+        end = len(self.pending) if maxCount is None else min(len(self.pending),\
+        self.index + maxCount)
+        commands = [(DIRECTIONS[code & 3], 'b' if code & BACK_FLAG else 'f')\
+        for code in self.pending[self.index:end]]
+        self.index = end
+        # Drops the consumed moves once they are the larger part of the buffer
+        if self.index > len(self.pending) // 2:
+            del self.pending[:self.index]
+            self.index = 0
+        return commands
+
+    def done(self):
+        """Checks if the whole walk has been received and consumed."""
+        return self.finished and self.index == len(self.pending)
@@ -1,5 +1,9 @@
 """Pseudo random congruential generator, using two terms reccurence."""
 
+from array import array
+
+from OneTermGenerator import primeFactors
+
 DEF_MOD_VAL = 2147483647
 DEF_MULTN2_VAL = 1583458089
 DEF_MULTN1_VAL = 784588716
@@ -89,3 +93,75 @@ class TwoTermGenerator(object):
         self.sn_1 = (self.an_2*self.sn_2 + self.an_1*self.sn_1) % self.mod
         self.sn_2 = tempSn_1
         return self.sn_1 / self.mod
+
+    def generateBlock(self, n):
+        """Generates n pseudo random numbers at once, in an array of doubles."""
+        block = array('d')
+        append = block.append
+        mod, an_2, an_1, sn_2, sn_1 = self.mod, self.an_2, self.an_1, self.sn_2, self.sn_1
+        for _ in range(n):
+            sn_2, sn_1 = sn_1, (an_2*sn_2 + an_1*sn_1) % mod
+            append(sn_1 / mod)
+        self.sn_2 = sn_2
+        self.sn_1 = sn_1
+        return block
+
+    def generateInt(self):
+        """Generates a pseudo random integer, uniform in [0, intRange())."""
+        tempSn_1 = self.sn_1
+        self.sn_1 = (self.an_2*self.sn_2 + self.an_1*self.sn_1) % self.mod
+        self.sn_2 = tempSn_1
+        return self.sn_1
+
+    def intRange(self):
+        """Returns the number of integers generateInt can return."""
+        return self.mod
+
+    def jumpAhead(self, n):
+        """Advances the generator by n numbers, in O(log n) operations."""
+        # The recurrence is (sn_1, sn_2) -> (an_1*sn_1 + an_2*sn_2, sn_1), a 2x2 matrix mod m
+        jump = matPow(self.matrix(), n, self.mod)
+        self.sn_1, self.sn_2 = (jump[0][0]*self.sn_1 + jump[0][1]*self.sn_2) % self.mod,\
+        (jump[1][0]*self.sn_1 + jump[1][1]*self.sn_2) % self.mod
+
+    def substream(self, i, length):
+        """Returns a new generator, starting at the i-th segment of given length of the sequence."""
+        stream = TwoTermGenerator(self.mod, self.an_2, self.an_1, self.sn_2, self.sn_1)
+        stream.jumpAhead(i * length)
+        return stream
+
+    def matrix(self):
+        """Returns the matrix of the recurrence."""
+        return ((self.an_1, self.an_2), (1, 0))
+
+    def period(self):
+        """Returns the period of the sequence : the order of the recurrence matrix modulo m."""
+        mod = self.mod
+        identity = ((1, 0), (0, 1))
+        # The order divides the size of the 2x2 invertible matrices group, m(m-1)^2(m+1)
+        period = mod * (mod - 1) * (mod - 1) * (mod + 1)
+        factors = set([mod] + primeFactors(mod - 1) + primeFactors(mod + 1))
+        for factor in factors:
+            while period % factor == 0 and matPow(self.matrix(), period // factor, mod) == identity:
+                period //= factor
+        return period
+
+    def split(self, k):
+        """Splits the sequence in k non-overlapping substreams."""
+        length = self.period() // k
+        return [self.substream(i, length) for i in range(k)]
+
+def matMult(a, b, mod):
+    """Multiplies two 2x2 matrices modulo mod."""
+    return (((a[0][0]*b[0][0] + a[0][1]*b[1][0]) % mod, (a[0][0]*b[0][1] + a[0][1]*b[1][1]) % mod),\
+    ((a[1][0]*b[0][0] + a[1][1]*b[1][0]) % mod, (a[1][0]*b[0][1] + a[1][1]*b[1][1]) % mod))
+
+def matPow(mat, n, mod):
+    """Raises a 2x2 matrix to the power n modulo mod, by binary exponentiation."""
+    result = ((1, 0), (0, 1))
+    while n > 0:
+        if n & 1:
+            result = matMult(result, mat, mod)
+        mat = matMult(mat, mat, mod)
+        n >>= 1
+    return result
@@ -1,94 +1,230 @@
 """Different types of walk."""
 
-from random import randint
-from math import sqrt
+from random import randint, random
+from math import hypot
+from itertools import chain
 from enum import Enum
+from time import perf_counter
+
+import WalkStats
+from BufferedGenerator import BufferedGenerator
+from DirectionSource import DirectionSource
 
 # Walk type
 class WalkType(Enum):
-    """RANDOM - NON_REVERSING - SELF_AVOIDING"""
-    RANDOM = 1 ; NON_REVERSING = 2 ; SELF_AVOIDING = 3
+    """RANDOM - NON_REVERSING - SELF_AVOIDING - PIVOT - ROSENBLUTH - PERM"""
+    RANDOM = 1 ; NON_REVERSING = 2 ; SELF_AVOIDING = 3 ; PIVOT = 4 ; ROSENBLUTH = 5 ; PERM = 6
 
 # Direction of a step
 class Direction(Enum):
     """NORTH - EAST - SOUTH - WEST"""
     NORTH = 1 ; EAST = 2 ; SOUTH = 3 ; WEST = 4
 
+# Maximum number of free points explored around the tip of a self avoiding walk to detect a pocket
+TRAP_LIMIT = 4096
+# A self avoiding walk can not fill a pocket : it is trapped unless the pocket holds this many free
+# points per remaining step
+FILL_FACTOR = 2
+# Number of last steps of a self avoiding walk making loops too small to be checked for a pocket :
+# the tip is only checked when it touches an older point and separates its free neighbours, or
+# when it is blocked
+LOOP_STEPS = 16
+
+# Integer direction codes (0-3, in the Direction order) : direction and step of each code, opposite
+# code, and codes allowed after each code (code 4 standing for no previous step)
+DIRECTIONS = (Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST)
+DX = (0, 1, 0, -1)
+DY = (1, 0, -1, 0)
+OPPOSITE = (2, 3, 0, 1)
+ALLOWED = tuple(tuple(c for c in range(4) if c != OPPOSITE[code]) for code in range(4))\
++ ((0, 1, 2, 3),)
+NO_CODE = 4
+# Code of each step vector
+STEP_CODES = {(DX[code], DY[code]): code for code in range(4)}
+# The eight points around a point, clockwise from the north one (neighbours at even indices)
+RING = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+
 # ============================================== WALKS =============================================
 def randomWalk(startPoint, nbSteps, model=None, generator=None):
     """Generates a random walk."""
-    point = startPoint
-    for _ in range(nbSteps):
-        nextDirection = pickDirection(initDir(), generator)
-        point = move(point, nextDirection, 1)
+    stats = WalkStats.ACTIVE
+    if stats is not None:
+        start = perf_counter()
+    x, y = startPoint
+    # Each step takes exactly one number (or 2 bits of a direction source), they can all be
+    # generated at once
+    if isinstance(generator, DirectionSource):
+        codes = generator.codes(nbSteps)
+    else:
+        draw = random if generator is None else BufferedGenerator(generator, nbSteps).generate
+        codes = (int(draw() * 4) for _ in range(nbSteps))
+    for code in codes:
+        x += DX[code]
+        y += DY[code]
         if model is not None:
-            notifyModel(model, nextDirection)
+            notifyModel(model, DIRECTIONS[code])
+    if stats is not None:
+        stats.addWalk('randomWalk', perf_counter() - start, steps=nbSteps, draws=nbSteps)
     # Returns the arrival point
-    return point
+    return (x, y)
 
 def nonReversingWalk(startPoint, nbSteps, model=None, generator=None):
     """Generates a non reversing walk."""
-    point = startPoint
-    nextDirection = None
-    for _ in range(nbSteps):
-        nextDirection = pickDirection(initDir(opposite(nextDirection)), generator)
-        point = move(point, nextDirection, 1)
+    stats = WalkStats.ACTIVE
+    if stats is not None:
+        start = perf_counter()
+    x, y = startPoint
+    # Each step takes exactly one number (or one choice of a direction source), they can all be
+    # generated at once : a choice among 4 directions, then among 3 allowed ones
+    if isinstance(generator, DirectionSource):
+        choices = chain(generator.codes(min(nbSteps, 1)), generator.turns(max(nbSteps - 1, 0)))
+    else:
+        draw = random if generator is None else BufferedGenerator(generator, nbSteps).generate
+        choices = (int(draw() * (3 if i else 4)) for i in range(nbSteps))
+    code = NO_CODE
+    for choice in choices:
+        code = ALLOWED[code][choice]
+        x += DX[code]
+        y += DY[code]
         if model is not None:
-            notifyModel(model, nextDirection)
+            notifyModel(model, DIRECTIONS[code])
+    if stats is not None:
+        stats.addWalk('nonReversingWalk', perf_counter() - start, steps=nbSteps, draws=nbSteps)
     # Returns the arrival point
-    return point
+    return (x, y)
 
 def selfAvoidingWalk(startPoint, nbSteps, backTrack=False, model=None, generator=None):
     """Generates a self avoiding walk."""
+    stats = WalkStats.ACTIVE
+    if stats is not None:
+        start = perf_counter()
+    # A direction source gives the choice among the allowed directions directly
+    pick = generator.pick if isinstance(generator, DirectionSource) else None
+    draw = random if generator is None else generator.generate
     point = startPoint
-    nextDirection = None
+    x, y = startPoint
+    lastCode = NO_CODE
     previousPts = [startPoint]
+    # Occupied points, with their index in previousPts
+    occupied = {startPoint: 0}
+    # If the current tip has already been checked for a pocket
+    checked = False
+    # Longest walk reached, and number of times the walk has been sent back to each length since
+    longest = 0
+    failures = {}
+    # Counters of the walk (statistics)
+    collisions = 0
+    checks = 0
+    backtracks = 0
+    popped = 0
+    deepest = 0
+    backtrackTime = 0.0
     count = 0
     while count < nbSteps:
-        nextDirection = pickDirection(initDir(opposite(nextDirection)), generator)
-        point = move(point, nextDirection, 1)
+        allowed = ALLOWED[lastCode]
+        if pick is None:
+            code = allowed[int(draw() * len(allowed))]
+        else:
+            code = allowed[pick(len(allowed))]
+        nextPoint = (x + DX[code], y + DY[code])
         # If the walk is folds up on itself
-        if previousPts.count(point):
+        if nextPoint in occupied:
+            collisions += 1
             if backTrack:
-                # Backtracks until there is no more conflict possible
-                nextDirection, stepsBack = backtrack(previousPts, nbSteps, model)
-                point = previousPts[-1]
-                count -= stepsBack
+                # Looks for a pocket once per tip, else another direction is drawn
+                if not checked and (occupied[nextPoint] < len(previousPts) - LOOP_STEPS\
+                and splits(point, occupied) or not freeDirections(point, occupied)):
+                    checked = True
+                    checks += 1
+                    if stats is not None:
+                        checkStart = perf_counter()
+                    stepsBack = backtrack(previousPts, nbSteps, model, occupied)
+                    if stepsBack > 0:
+                        # A pocket can be large enough but too narrow for the remaining steps :
+                        # the walk goes back further each time it is sent back to the same length
+                        length = len(previousPts)
+                        extraSteps = min(failures.get(length, 0), length - 1)
+                        failures[length] = failures.get(length, 0) + 1
+                        stepsBack += stepBack(previousPts, extraSteps, model, occupied)
+                        point = previousPts[-1]
+                        x, y = point
+                        lastCode = stepCode(previousPts[-2], point) if len(previousPts) > 1\
+                        else NO_CODE
+                        count -= stepsBack
+                        checked = False
+                        backtracks += 1
+                        popped += stepsBack
+                        deepest = max(deepest, stepsBack)
+                    if stats is not None:
+                        backtrackTime += perf_counter() - checkStart
             else:
                 # If the next point have already been passed on, cancels the current walk.
                 # Cancelling the walk instead of continuing with restricted choices avoids
                 # miscalculating the average length of a self avoiding walk
-                return None
+                point = None
+                break
         else:
-            previousPts.append(point)
+            occupied[nextPoint] = len(previousPts)
+            previousPts.append(nextPoint)
+            point = nextPoint
+            x, y = nextPoint
+            lastCode = code
+            checked = False
             count += 1
+            if count > longest:
+                longest = count
+                failures.clear()
             if model is not None:
-                notifyModel(model, nextDirection)
+                notifyModel(model, DIRECTIONS[code])
+    if stats is not None:
+        # Each drawn direction gives a step or a collision
+        stats.addWalk('selfAvoidingWalk', perf_counter() - start, rejections=int(point is None),\
+        steps=count + popped, draws=count + popped + collisions, collisions=collisions,\
+        trapChecks=checks, backtracks=backtracks, stepsPopped=popped)
+        stats.maximum('selfAvoidingWalk.backtrackDepth', deepest)
+        stats.addTime('selfAvoidingWalk.backtrack', backtrackTime)
     # Returns the arrival point
     return point
 
-def backtrack(points, nbSteps, model=None):
-    """Goes back until there is no more conflict possible."""
-    finished = False
+def backtrack(points, nbSteps, model=None, occupied=None):
+    """Goes back to the entrance of the pocket the walk is trapped in, returns the steps undone."""
+    if occupied is None:
+        occupied = {p: i for i, p in enumerate(points)}
     stepsBack = 0
-    sight = 2
-    while not finished:
-        comingFrom = towards(points[-1], points[-2])
-        if conflict(points, points[-1], sight, comingFrom):
-            points.pop()
-            stepsBack += 1
-            if model is not None:
-                notifyModel(model, comingFrom, 'b')
-        else:
-            finished = True
-    return opposite(comingFrom), stepsBack
+    # The walk is trapped if the free points around its tip can not hold the remaining steps
+    region = pocket(points[-1], occupied, trapLimit(points, nbSteps))
+    while region is not None and len(points) > 1:
+        # The entrance is the last point of the walk next to a free point out of the pocket
+        entrance = len(points) - 2
+        while entrance > 0 and not escapes(points[entrance], occupied, region):
+            entrance -= 1
+        stepsBack += stepBack(points, len(points) - 1 - entrance, model, occupied)
+        # The pocket can be inside a larger one
+        region = pocket(points[-1], occupied, trapLimit(points, nbSteps))
+    return stepsBack
+
+def trapLimit(points, nbSteps):
+    """Returns the number of free points a pocket needs to hold the remaining steps of a walk."""
+    return min(FILL_FACTOR * (nbSteps - len(points) + 1), TRAP_LIMIT)
+
+def stepBack(points, nbSteps, model, occupied):
+    """Removes the last steps of a walk, returns their number."""
+    for _ in range(nbSteps):
+        comingFrom = DIRECTIONS[stepCode(points[-1], points[-2])]
+        # Keeps the occupancy index in sync with the walk
+        del occupied[points.pop()]
+        if model is not None:
+            notifyModel(model, comingFrom, 'b')
+    return nbSteps
 
 # ======================================= AUXILIARY FUNCTIONS ======================================
 def pickDirection(directions, generator=None):
     """Picks a direction among a list."""
     # The list should not be empty
     if directions:
-        if generator is not None:
+        if isinstance(generator, DirectionSource):
+            nextInt = generator.pick(len(directions))
+        elif generator is not None:
             nextInt = int(generator.generate() * (len(directions)))
         else:
             nextInt = randint(0, len(directions) - 1)
@@ -99,66 +235,84 @@ def pickDirection(directions, generator=None):
 
 def opposite(direction):
     """Returns the opposite of a direction."""
-    if direction == Direction.NORTH:
-        return Direction.SOUTH
-    elif direction == Direction.EAST:
-        return Direction.WEST
-    elif direction == Direction.SOUTH:
-        return Direction.NORTH
-    elif direction == Direction.WEST:
-        return Direction.EAST
-    else:
+    if direction is None:
         return None
+    return DIRECTIONS[OPPOSITE[direction.value - 1]]
 
 def initDir(forbidden=None):
     """Creates a list with available directions."""
-    directions = [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]
-    if forbidden is not None:
-        directions.remove(forbidden)
-    return directions
+    if forbidden is None:
+        return list(DIRECTIONS)
+    return [DIRECTIONS[code] for code in ALLOWED[OPPOSITE[forbidden.value - 1]]]
+
+def freeDirections(point, occupied):
+    """Creates a list with the directions leading to a point out of the walk."""
+    x, y = point
+    return [DIRECTIONS[code] for code in range(4) if (x + DX[code], y + DY[code]) not in occupied]
 
 def move(p, direction, stepSize):
     """Moves in a given direction."""
-    x, y = p
-    if direction == Direction.NORTH:
-        return (x, y+stepSize)
-    elif direction == Direction.EAST:
-        return (x+stepSize, y)
-    elif direction == Direction.SOUTH:
-        return (x, y-stepSize)
-    elif direction == Direction.WEST:
-        return (x-stepSize, y)
-    else:
+    if direction is None:
         return None
+    code = direction.value - 1
+    return (p[0] + DX[code]*stepSize, p[1] + DY[code]*stepSize)
 
 def towards(p1, p2):
     """Returns the 'p1 to p2' direction."""
-    subOp = lambda x, y: x - y
-    p1SubP2 = list(map(subOp, p2, p1))
-    if p1SubP2[0] > 0:
+    dx = p2[0] - p1[0]
+    dy = p2[1] - p1[1]
+    if dx > 0:
         return Direction.EAST
-    elif p1SubP2[0] < 0:
+    elif dx < 0:
         return Direction.WEST
-    elif p1SubP2[1] > 0:
+    elif dy > 0:
         return Direction.NORTH
-    elif p1SubP2[1] < 0:
+    elif dy < 0:
         return Direction.SOUTH
     # If the points are the same
     else:
         return None
 
-def conflict(walk, point, sight, comingFrom=None):
-    """Detects if the given point can collide with the walk."""
-    directions = initDir(comingFrom)
-    conf = False
-    if sight > 0:
-        for di in directions:
-            newPoint = move(point, di, 1)
-            if walk.count(newPoint):
-                return True
-            else:
-                conf = conf and conflict(walk, newPoint, sight-1, Direction(opposite(di)))
-    return conf
+def stepCode(p1, p2):
+    """Returns the code of the step from p1 to p2 (neighbours)."""
+    return STEP_CODES[(p2[0] - p1[0], p2[1] - p1[1])]
+
+def pocket(point, occupied, limit):
+    """Returns the free points reachable from a point, or None if there are at least limit."""
+    region = set()
+    frontier = [point]
+    size = 0
+    # Bounded flood fill : stops as soon as the region is known to be large enough
+    while frontier:
+        x, y = frontier.pop()
+        for neighbour in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+            if neighbour not in occupied and neighbour not in region:
+                region.add(neighbour)
+                size += 1
+                if size >= limit:
+                    return None
+                frontier.append(neighbour)
+    return region
+
+def splits(point, occupied):
+    """Checks if a point of the walk separates the free neighbours it has (locally)."""
+    x, y = point
+    free = [(x + dx, y + dy) not in occupied for dx, dy in RING]
+    # A free neighbour starts a run of free points unless it is joined to the previous neighbour
+    runs = 0
+    for i in range(0, 8, 2):
+        if free[i] and not (free[i - 1] and free[i - 2]):
+            runs += 1
+    return runs > 1
+
+def escapes(point, occupied, region):
+    """Checks if a point is next to a free point out of a region."""
+    x, y = point
+    for code in range(4):
+        neighbour = (x + DX[code], y + DY[code])
+        if neighbour not in occupied and neighbour not in region:
+            return True
+    return False
 
 def notifyModel(model, direction, mode='f'):
     """Updates the model."""
@@ -166,6 +320,5 @@ def notifyModel(model, direction, mode='f'):
 
 def distance(p1, p2):
     """Computes the Euclidian distance between two points."""
-    subOp = lambda x, y: pow(x - y, 2)
-    return sqrt(sum(list(map(subOp, p1, p2))))
+    return hypot(p1[0] - p2[0], p1[1] - p2[1])
 # ==================================================================================================
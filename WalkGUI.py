@@ -3,23 +3,32 @@
 from tkinter import Tk, PanedWindow, Canvas, LabelFrame, Scale, DoubleVar, Label
 from tkinter import TOP, Y, BOTH, ALL, VERTICAL, HORIZONTAL
 from math import floor, sqrt
-from time import sleep
-import queue
+from time import sleep, perf_counter
 
 from Walk import WalkType, move, distance
+from Transport import ChunkedReceiver
 
 # Default parameters
 DEFAULT_REFRESH_RATE = 1
 CANVAS_SIZE = 600
 START_POS = (CANVAS_SIZE/2, CANVAS_SIZE/2)
 BG_COLOR = '#f0f8ff'
+# Fast rendering : time spent rendering a frame (s), waiting time between two frames (ms),
+# first and maximum numbers of steps of a frame, and maximum number of points of a polyline
+FRAME_BUDGET = 0.02
+FRAME_DELAY = 10
+FIRST_FRAME_STEPS = 1000
+MAX_FRAME_STEPS = 100000
+MAX_SEGMENT_POINTS = 5000
 
 class WalkGUI(object):
     """Rendering of a random walk."""
 
-    def __init__(self, modelProc):
+    def __init__(self, modelProc, fastRendering=False):
         self.modelProc = modelProc
-        self.queue = modelProc.getQueue()
+        # Renders many steps per frame as polylines, for very long walks
+        self.fastRendering = fastRendering
+        self.receiver = ChunkedReceiver(modelProc.getQueue())
         # ----------------- Model parameters -----------------
         # Starting point
         self.curPoint = START_POS
@@ -31,6 +40,11 @@ class WalkGUI(object):
         self.count = 0
         # Canvas lines
         self.lines = []
+        # Canvas polylines (fast rendering), as [line, points], and the ones to redraw
+        self.segments = []
+        self.trimmed = {}
+        # Number of steps rendered in a frame (fast rendering), adapted to the frame budget
+        self.frameSteps = FIRST_FRAME_STEPS
         # ------------------------ GUI -----------------------
         # Main window
         self.window = Tk()
@@ -75,11 +89,13 @@ class WalkGUI(object):
         walkType = self.modelProc.getWalkType()
         nbSteps = self.modelProc.getNbSteps()
         if walkType == WalkType.RANDOM:
-            return floor((CANVAS_SIZE/2)/(1.6*sqrt(nbSteps)))
+            size = (CANVAS_SIZE/2)/(1.6*sqrt(nbSteps))
         elif walkType == WalkType.NON_REVERSING:
-            return floor((CANVAS_SIZE/2)/(2.5*sqrt(nbSteps)))
+            size = (CANVAS_SIZE/2)/(2.5*sqrt(nbSteps))
         else:
-            return floor((CANVAS_SIZE/2)/(pow(nbSteps, 3/4)))
+            size = (CANVAS_SIZE/2)/(pow(nbSteps, 3/4))
+        # Very long walks need steps smaller than a pixel
+        return floor(size) if size >= 1 else size
 
     def onClosing(self):
         """Called when exiting the window."""
@@ -94,13 +110,23 @@ class WalkGUI(object):
         self.window.mainloop()
 
     def getDirection(self):
-        """Gets a direction from the queue, if possible."""
-        try:
-            direction = self.queue.get(False)
-            self.update(direction)
-            self.window.after(int(self.refreshRate*1000), self.getDirection)
-        except queue.Empty:
+        """Gets the directions available in the queue, and renders them."""
+        self.receiver.drain()
+        if self.fastRendering:
+            start = perf_counter()
+            commands = self.receiver.commands(self.frameSteps)
+            self.updateFrame(commands)
+            self.adaptFrame(perf_counter() - start, len(commands))
+            delay = FRAME_DELAY
+        else:
+            # Without waiting time, renders everything available, else one step per event
+            for command in self.receiver.commands(None if self.refreshRate == 0 else 1):
+                self.update(command)
+            delay = int(self.refreshRate*1000)
+        if self.receiver.done():
             self.updateDistance()
+        else:
+            self.window.after(delay, self.getDirection)
 
     def update(self, command):
         """Updates the rendering."""
@@ -121,6 +147,57 @@ class WalkGUI(object):
             self.updateStep()
         return self.refreshRate
 
+    def updateFrame(self, commands):
+        """Updates the rendering with many steps, drawn as a single polyline."""
+        points = [self.curPoint]
+        for direction, mode in commands:
+            self.curPoint = move(self.curPoint, direction, self.step)
+            # If the model is backtracking
+            if mode == 'b':
+                if len(points) > 1:
+                    points.pop()
+                else:
+                    self.trimSegment()
+                    points = [self.curPoint]
+                self.count -= 1
+            else:
+                points.append(self.curPoint)
+                self.count += 1
+                if len(points) == MAX_SEGMENT_POINTS:
+                    self.addSegment(points)
+                    points = [self.curPoint]
+        if len(points) > 1:
+            self.addSegment(points)
+        # Trimmed polylines are redrawn once per frame
+        for line, points in self.trimmed.values():
+            self.canvas.coords(line, *[c for point in points for c in point])
+        self.trimmed.clear()
+        self.updateStep()
+
+    def addSegment(self, points):
+        """Draws a polyline, and keeps a handle on it to trim it if necessary (backtrack)."""
+        line = self.canvas.create_line(*[c for point in points for c in point])
+        self.segments.append([line, points])
+
+    def trimSegment(self):
+        """Removes the last point of the last polyline."""
+        segment = self.segments[-1]
+        segment[1].pop()
+        if len(segment[1]) > 1:
+            self.trimmed[segment[0]] = segment
+        else:
+            self.canvas.delete(segment[0])
+            self.trimmed.pop(segment[0], None)
+            self.segments.pop()
+
+    def adaptFrame(self, elapsed, nbCommands):
+        """Adapts the number of steps of a frame to the time spent rendering the last one."""
+        # Only a full frame tells if more steps can be rendered (not the frames waiting for data)
+        if elapsed < FRAME_BUDGET/2 and nbCommands == self.frameSteps:
+            self.frameSteps = min(2 * self.frameSteps, MAX_FRAME_STEPS)
+        elif elapsed > FRAME_BUDGET and self.frameSteps > 1:
+            self.frameSteps //= 2
+
     def updateStep(self):
         """Updates the stepLabel value."""
         self.stepLabel['text'] = "# Current step :\n" + str(self.count)
@@ -0,0 +1,82 @@
+"""Optional counters and timings of the walk generation."""
+
+# Statistics recorded by the walks of this process. Set to 'None' (the default) to record nothing.
+ACTIVE = None
+
+class WalkStats(object):
+    """Counters, maxima and timings of the walks, by walk function, aggregated over processes."""
+
+    # Constructor
+    def __init__(self):
+        self.counters = {}
+        self.maxima = {}
+        self.timings = {}
+
+    def count(self, name, n=1):
+        """Adds n to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def maximum(self, name, value):
+        """Keeps the maximum of a value."""
+        if value > self.maxima.get(name, 0):
+            self.maxima[name] = value
+
+    def addTime(self, name, seconds):
+        """Adds the time spent in a phase."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def addWalk(self, func, seconds, **counters):
+        """Records a walk attempt of a walk function, with its counters."""
+        self.count(func + ".attempts")
+        self.addTime(func, seconds)
+        for name, n in counters.items():
+            if n:
+                self.count(func + "." + name, n)
+
+    def merge(self, other):
+        """Adds the statistics of another process."""
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, value in other.maxima.items():
+            self.maximum(name, value)
+        for name, seconds in other.timings.items():
+            self.addTime(name, seconds)
+
+    def getState(self):
+        """Returns the state of the statistics, as a dictionary."""
+        return {'counters': dict(self.counters), 'maxima': dict(self.maxima),\
+        'timings': dict(self.timings)}
+
+    def setState(self, state):
+        """Restores a state returned by getState."""
+        self.counters = dict(state['counters'])
+        self.maxima = dict(state['maxima'])
+        self.timings = dict(state['timings'])
+
+    def report(self):
+        """Returns the statistics as text, with the averages per walk attempt."""
+        lines = ["# Walk statistics"]
+        for name in sorted(self.counters):
+            func = name.split('.')[0]
+            attempts = self.counters.get(func + ".attempts", 0)
+            line = " -> {:<40} {:>14}".format(name, self.counters[name])
+            if attempts and not name.endswith(".attempts"):
+                line += "  ({:.3f} per attempt)".format(self.counters[name] / attempts)
+            lines.append(line)
+        for name in sorted(self.maxima):
+            lines.append(" -> {:<40} {:>14} (maximum)".format(name, self.maxima[name]))
+        for name in sorted(self.timings):
+            lines.append(" -> {:<40} {:>14.3f} s".format(name, self.timings[name]))
+        return "\n".join(lines)
+
+def enable():
+    """Starts recording the statistics of the walks of this process, returns them."""
+    global ACTIVE
+    ACTIVE = WalkStats()
+    return ACTIVE
+
+def disable():
+    """Stops recording the statistics, returns the recorded ones (or None)."""
+    global ACTIVE
+    stats, ACTIVE = ACTIVE, None
+    return stats
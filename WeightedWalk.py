@@ -0,0 +1,113 @@
+"""Weighted self avoiding walks : Rosenbluth and pruned-enriched Rosenbluth (PERM) growth."""
+
+from random import random
+from time import perf_counter
+
+import WalkStats
+from Walk import pickDirection, freeDirections, move, notifyModel
+
+# PERM thresholds, relatively to the estimated average weight at the same length
+ENRICH_THRESHOLD = 3.0
+PRUNE_THRESHOLD = 0.3
+
+# ============================================== WALKS =============================================
+def rosenbluthWalk(startPoint, nbSteps, model=None, generator=None):
+    """Generates a self avoiding walk by Rosenbluth growth, returns its arrival and weight."""
+    stats = WalkStats.ACTIVE
+    if stats is not None:
+        start = perf_counter()
+    point = startPoint
+    occupied = {startPoint}
+    weight = 1.0
+    count = 0
+    while count < nbSteps:
+        directions = freeDirections(point, occupied)
+        # If the walk is trapped, it does not contribute
+        if not directions:
+            point, weight = None, 0.0
+            break
+        weight *= growthFactor(len(directions), count)
+        nextDirection = pickDirection(directions, generator)
+        point = move(point, nextDirection, 1)
+        occupied.add(point)
+        count += 1
+        if model is not None:
+            notifyModel(model, nextDirection)
+    if stats is not None:
+        stats.addWalk('rosenbluthWalk', perf_counter() - start, rejections=int(point is None),\
+        steps=count, draws=count)
+    # Returns the arrival point, and its statistical weight
+    return point, weight
+
+def rosenbluthSamples(startPoint, nbSteps, nbWalks, generator=None):
+    """Samples the arrivals and weights of several Rosenbluth walks."""
+    return [rosenbluthWalk(startPoint, nbSteps, None, generator) for _ in range(nbWalks)]
+
+def permSamples(startPoint, nbSteps, nbTours, generator=None):
+    """Samples the arrivals and weights of the walks grown during several PERM tours."""
+    stats = WalkStats.ACTIVE
+    if stats is not None:
+        start = perf_counter()
+    # Counters of the tours (statistics)
+    steps = 0
+    enrichments = 0
+    prunings = 0
+    samples = []
+    # Sum of the weights reached at each length, to estimate the average weights
+    weightSums = [0.0] * (nbSteps+1)
+    path = [startPoint]
+    occupied = {startPoint}
+    for tour in range(1, nbTours+1):
+        # Walks waiting to be grown, as (length, weight), from the current path's prefix
+        pending = [(0, 1.0)]
+        while pending:
+            count, weight = pending.pop()
+            # Goes back to the prefix of the pending walk
+            while len(path) > count+1:
+                occupied.remove(path.pop())
+            while count < nbSteps:
+                directions = freeDirections(path[-1], occupied)
+                if not directions:
+                    break
+                weight *= growthFactor(len(directions), count)
+                point = move(path[-1], pickDirection(directions, generator), 1)
+                path.append(point)
+                occupied.add(point)
+                count += 1
+                steps += 1
+                weightSums[count] += weight
+                average = weightSums[count] / tour
+                if weight > ENRICH_THRESHOLD * average:
+                    # Enrichment : a copy will be grown later from the same prefix
+                    weight /= 2
+                    pending.append((count, weight))
+                    enrichments += 1
+                elif weight < PRUNE_THRESHOLD * average:
+                    # Pruning : half of the light walks are dropped, the others weigh twice more
+                    prunings += 1
+                    if draw(generator) < 0.5:
+                        break
+                    weight *= 2
+            else:
+                samples.append((path[-1], weight))
+    if stats is not None:
+        stats.count('permSamples.tours', nbTours)
+        stats.count('permSamples.walks', len(samples))
+        stats.count('permSamples.steps', steps)
+        stats.count('permSamples.draws', steps + prunings)
+        stats.count('permSamples.enrichments', enrichments)
+        stats.count('permSamples.prunings', prunings)
+        stats.addTime('permSamples', perf_counter() - start)
+    return samples
+
+# ======================================= AUXILIARY FUNCTIONS ======================================
+def growthFactor(nbChoices, count):
+    """Weight factor of a step, relatively to a non reversing walk (4 choices, then 3)."""
+    return nbChoices / (4 if count == 0 else 3)
+
+def draw(generator=None):
+    """Draws a uniform number in [0, 1)."""
+    if generator is not None:
+        return generator.generate()
+    return random()
+# ==================================================================================================